@@ -0,0 +1,231 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import csv
+import glob
+import os
+import time
+
+from main_version2 import (Grid, Solver, format_solution, read_bff_file,
+                           save_solution)
+
+
+def find_bff_files(sources):
+    """
+    Collect the BFF files to solve.
+
+    Parameters:
+    sources : list of str
+        Directories, whose '.bff' files are all taken,
+        or glob patterns such as 'levels/mad_*.bff'.
+
+    Returns:
+    list of str
+        The paths of the BFF files found, without duplicates.
+    """
+    file_paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            matches = glob.glob(os.path.join(source, '*.bff'))
+        else:
+            matches = glob.glob(source)
+        for file_path in sorted(matches):
+            if file_path not in file_paths:
+                file_paths.append(file_path)
+    return file_paths
+
+
+def solution_dirs(file_paths, output_dir='.'):
+    """
+    Choose the directory of the solution file of each puzzle.
+
+    Solution files are named after the BFF file only, so if two
+    files share a name, such as 'easy/level_1.bff' and
+    'hard/level_1.bff', each solution is written under its path
+    relative to the directory common to all the files instead,
+    'easy/level_1_solution.txt' and 'hard/level_1_solution.txt'.
+
+    Parameters:
+    file_paths : list of str
+        The paths of the BFF files, as found by find_bff_files.
+    output_dir : str
+        The directory to write the solution files to.
+
+    Returns:
+    dict
+        The output directory of each file path.
+    """
+    names = [os.path.basename(file_path) for file_path in file_paths]
+    if len(set(names)) == len(names):
+        return {file_path: output_dir for file_path in file_paths}
+
+    full_paths = [os.path.abspath(file_path) for file_path in file_paths]
+    common = os.path.commonpath([os.path.dirname(full_path)
+                                 for full_path in full_paths])
+    return {file_path: os.path.normpath(os.path.join(
+                output_dir, os.path.relpath(os.path.dirname(full_path),
+                                            common)))
+            for file_path, full_path in zip(file_paths, full_paths)}
+
+
+def estimate_difficulty(file_path):
+    """
+    Estimate how hard a puzzle is to solve, as the number of
+    free cells times the number of blocks to place.
+
+    Parameters:
+    file_path : str
+        The path to the BFF file containing the lazor puzzle data.
+
+    Returns:
+    int
+        The estimated difficulty, larger is harder.
+    """
+    grid_data, _, _, blocks = read_bff_file(file_path)
+    free_cells = sum(row.count('o') for row in grid_data)
+    return free_cells * sum(blocks.values())
+
+
+def solve_file(file_path, output_dir='.', guided=False, time_limit=None):
+    """
+    Solve one puzzle in a worker process and write its solution file.
+
+    Parameters:
+    file_path : str
+        The path to the BFF file containing the lazor puzzle data.
+    output_dir : str
+        The directory to write the solution file to.
+    guided : boolean
+        Whether to use the beam-guided search.
+    time_limit : float or None
+        The most seconds the search may take, None for no limit.
+        If it runs out, the best placement found is written instead.
+
+    Returns:
+    tuple
+        (status, seconds, output_file_name) for the puzzle, status
+        being 'solved', 'no solution', 'timed out (k/n targets)' or
+        'timed out (no complete placement)'.
+    """
+    start = time.perf_counter()
+    grid_data, lasers, targets, blocks = read_bff_file(file_path)
+    grid = Grid(grid_data, targets)
+    solver = Solver(grid, blocks, lasers, targets, guided,
+                    time_limit=time_limit)
+    solution = solver.solve()
+    elapsed = time.perf_counter() - start
+
+    best_hits = None
+    if solution is not None:
+        status = 'solved'
+    elif solver.budget_exhausted and solver.best_hits is not None:
+        best_hits = solver.best_hits
+        for block_type, position in solver.best_blocks:
+            grid.place_block(position, block_type)
+        status = f'timed out ({len(best_hits)}/{len(targets)} targets)'
+    elif solver.budget_exhausted:
+        status = 'timed out (no complete placement)'
+    else:
+        status = 'no solution'
+
+    solution_output = format_solution(file_path, grid, solution, best_hits,
+                                      solver.budget_exhausted)
+    output_file_name = save_solution(file_path, solution_output, output_dir)
+    return status, elapsed, output_file_name
+
+
+def batch_solve(sources, workers=None, output_dir='.', guided=False,
+                summary_name='batch_summary.csv', time_limit=None):
+    """
+    Solve every puzzle found in the sources on a process pool.
+
+    The hardest puzzles are started first, so that a long puzzle
+    does not end up running alone at the end of the batch. Each
+    solution file is written as soon as its puzzle is solved, and a
+    summary of the timings is written once every puzzle is done.
+    Puzzles sharing a file name keep their relative directory in
+    the output directory, see solution_dirs.
+
+    Parameters:
+    sources : list of str
+        Directories or glob patterns, see find_bff_files.
+    workers : int or None
+        The number of worker processes, all cores if None.
+    output_dir : str
+        The directory to write the solution and summary files to.
+    guided : boolean
+        Whether to use the beam-guided search.
+    summary_name : str
+        The name of the summary file.
+    time_limit : float or None
+        The most seconds the search of each puzzle may take,
+        None for no limit.
+
+    Returns:
+    list of dict
+        One row per puzzle with its file, difficulty,
+        status and solve time, as written to the summary.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    file_paths = find_bff_files(sources)
+    output_dirs = solution_dirs(file_paths, output_dir)
+    rows = []
+    scheduled = []
+    for file_path in file_paths:
+        try:
+            difficulty = estimate_difficulty(file_path)
+        except Exception as e:
+            rows.append({'file': file_path, 'difficulty': '',
+                         'status': f'error: {e}', 'seconds': ''})
+            continue
+        os.makedirs(output_dirs[file_path], exist_ok=True)
+        scheduled.append((difficulty, file_path))
+    scheduled.sort(key=lambda item: item[0], reverse=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(solve_file, file_path,
+                                   output_dirs[file_path], guided,
+                                   time_limit):
+                   (difficulty, file_path)
+                   for difficulty, file_path in scheduled}
+        for future in as_completed(futures):
+            difficulty, file_path = futures[future]
+            try:
+                status, elapsed, output_file_name = future.result()
+            except Exception as e:
+                status, seconds = f'error: {e}', ''
+                print(f"{file_path}: {status}")
+            else:
+                seconds = f'{elapsed:.3f}'
+                print(f"{file_path}: {status} in {seconds} s "
+                      f"-> {output_file_name}")
+            rows.append({'file': file_path, 'difficulty': difficulty,
+                         'status': status, 'seconds': seconds})
+
+    summary_file_name = os.path.join(output_dir, summary_name)
+    with open(summary_file_name, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=['file', 'difficulty',
+                                                  'status', 'seconds'])
+        writer.writeheader()
+        writer.writerows(sorted(rows, key=lambda row: row['file']))
+    print(f"Timing summary written to {summary_file_name}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Solve a batch of lazor puzzles.")
+    parser.add_argument("sources", nargs="+",
+                        help="directories or glob patterns of .bff files")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of processes, all cores by default")
+    parser.add_argument("--output-dir", default=".",
+                        help="directory for the solution and summary files")
+    parser.add_argument("--guided", action="store_true",
+                        help="only place blocks where the lasers pass")
+    parser.add_argument("--time-limit", type=float, default=None,
+                        help="stop the search of a puzzle after this "
+                             "many seconds")
+    args = parser.parse_args()
+    batch_solve(args.sources, args.workers, args.output_dir, args.guided,
+                time_limit=args.time_limit)
@@ -0,0 +1,571 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import glob
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows, peak RSS is not recorded
+    resource = None
+
+import main_version1
+from main_version1 import multiset_permutations
+from main_version2 import (ORDERINGS, Block, Grid, Solver, process_solve,
+                           read_bff_file, simulate)
+
+
+# The boards of the benchmark suite
+CORPUS = sorted(glob.glob(os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), 'Lazor data', '*.bff')))
+
+
+def time_solve(file_path, workers=1, repeat=3):
+    """
+    Time how long it takes to solve a lazor puzzle.
+
+    Parameters:
+    file_path : str
+        The path to the BFF file containing the lazor puzzle data.
+    workers : int
+        The number of processes to search with, 1 for a plain Solver.
+    repeat : int
+        The number of timed runs, the best one is kept.
+
+    Returns:
+    float
+        The shortest wall time of the runs, in seconds.
+    """
+    puzzle = read_bff_file(file_path)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if workers > 1:
+            process_solve(puzzle, workers)
+        else:
+            grid_data, lasers, targets, blocks = puzzle
+            Solver(Grid(grid_data, targets), blocks, lasers, targets).solve()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def parallel_speedup(file_paths, worker_counts, repeat=3):
+    """
+    Print the wall time and speedup of process_solve
+    for several numbers of workers.
+
+    Parameters:
+    file_paths : list of str
+        The BFF files to solve.
+    worker_counts : list of int
+        The numbers of worker processes to compare.
+    repeat : int
+        The number of timed runs for each setting.
+    """
+    print(f"{'puzzle':<20}{'workers':>8}{'time (s)':>12}{'speedup':>10}")
+    for file_path in file_paths:
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        baseline = time_solve(file_path, 1, repeat)
+        print(f"{name:<20}{1:>8}{baseline:>12.3f}{1.0:>10.2f}")
+        for workers in worker_counts:
+            if workers == 1:
+                continue
+            elapsed = time_solve(file_path, workers, repeat)
+            print(f"{name:<20}{workers:>8}{elapsed:>12.3f}"
+                  f"{baseline / elapsed:>10.2f}")
+
+
+def old_possible_grids(initial_grid, block_dict, built=None):
+    """
+    The generate_possible_grids of main_version1 from before
+    multiset_permutations, kept to compare with. It builds
+    set(itertools.permutations(...)) again for every combination
+    of positions.
+
+    Parameters:
+    initial_grid : list of list of str
+        The original empty grid, with 'x' and 'o'.
+    block_dict : dict
+        The number of blocks of each type to place.
+    built : list of int or None
+        If given, built[0] counts the order tuples kept in the sets.
+
+    Yields:
+    list of list of str
+        One grid with the blocks placed.
+    """
+    empty_positions = [(x, y) for y in range(len(initial_grid))
+                       for x in range(len(initial_grid[0]))
+                       if initial_grid[y][x] == 'o']
+    block_types = sorted(b for b, count in block_dict.items()
+                         for _ in range(count))
+    total_blocks = len(block_types)
+
+    for positions in itertools.combinations(empty_positions, total_blocks):
+        block_orders = set(itertools.permutations(block_types, total_blocks))
+        if built is not None:
+            built[0] += len(block_orders)
+        for block_order in block_orders:
+            new_grid = [row[:] for row in initial_grid]
+            for (x, y), block_type in zip(positions, block_order):
+                new_grid[y][x] = block_type
+            yield new_grid
+
+
+def grid_cost(make_grids, count):
+    """
+    Measure the CPU time of going through the first grids
+    of a generator.
+
+    Parameters:
+    make_grids : callable
+        Returns a new generator of grids.
+    count : int
+        The number of grids to go through.
+
+    Returns:
+    float
+        The CPU time, in seconds.
+    """
+    start = time.process_time()
+    for _ in itertools.islice(make_grids(), count):
+        pass
+    return time.process_time() - start
+
+
+def permutation_cost(file_paths, combinations=100):
+    """
+    Print the cost of generate_possible_grids in main_version1,
+    with the old set(itertools.permutations(...)) for every
+    combination of positions and with multiset_permutations.
+
+    Both generators run over the grids of the same first
+    combinations of positions, each combination giving one grid
+    per distinct order of the blocks.
+
+    The allocations that differ are the order tuples, the grids being
+    the same. The old generator keeps a new tuple for each distinct
+    order of every combination, counted as it runs, while
+    generate_possible_grids builds the list of multiset_permutations
+    once. tracemalloc cannot show this churn: itertools.permutations
+    reuses its tuple when the set drops a duplicate, and the freed
+    tuples and sets come back from the CPython free lists.
+
+    Parameters:
+    file_paths : list of str
+        The BFF files whose grids are generated.
+    combinations : int
+        The number of combinations of positions to go through.
+    """
+    print(f"{'puzzle':<16}{'grids':>10}{'old (s)':>10}{'old tuples':>12}"
+          f"{'new (s)':>10}{'new tuples':>12}")
+    for file_path in file_paths:
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        grid_data, _, _, blocks = read_bff_file(file_path)
+        new_tuples = len(list(multiset_permutations(blocks)))
+        count = combinations * new_tuples
+
+        old_time = grid_cost(
+            lambda: old_possible_grids(grid_data, blocks), count)
+        old_tuples = [0]
+        grids = sum(1 for _ in itertools.islice(
+            old_possible_grids(grid_data, blocks, old_tuples), count))
+        new_time = grid_cost(
+            lambda: main_version1.generate_possible_grids(grid_data, blocks),
+            count)
+        print(f"{name:<16}{grids:>10}{old_time:>10.3f}{old_tuples[0]:>12}"
+              f"{new_time:>10.3f}{new_tuples:>12}")
+
+
+def precheck_node_counts(file_paths):
+    """
+    Print the number of recursive_solve nodes and the solve time
+    of each puzzle without and with the reachability precheck.
+
+    Parameters:
+    file_paths : list of str
+        The BFF files to solve.
+    """
+    print(f"{'puzzle':<16}{'nodes':>10}{'time (s)':>10}"
+          f"{'precheck nodes':>16}{'time (s)':>10}")
+    for file_path in file_paths:
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        grid_data, lasers, targets, blocks = read_bff_file(file_path)
+        results = []
+        for precheck in (False, True):
+            solver = Solver(Grid(grid_data, targets), blocks, lasers,
+                            targets, precheck=precheck)
+            start = time.perf_counter()
+            solver.solve()
+            results.append((solver.node_count,
+                            time.perf_counter() - start))
+        (nodes, elapsed), (precheck_nodes, precheck_elapsed) = results
+        print(f"{name:<16}{nodes:>10}{elapsed:>10.3f}"
+              f"{precheck_nodes:>16}{precheck_elapsed:>10.3f}")
+
+
+def ordering_node_counts(file_paths, orderings, precheck=False):
+    """
+    Print the number of recursive_solve nodes and the solve time
+    of each puzzle for several orderings of the search.
+
+    Parameters:
+    file_paths : list of str
+        The BFF files to solve.
+    orderings : list of str
+        The names of the orderings to compare, keys of ORDERINGS.
+    precheck : boolean
+        Whether the searches use the reachability precheck.
+    """
+    print(f"{'puzzle':<16}{'ordering':>10}{'nodes':>10}{'time (s)':>10}")
+    for file_path in file_paths:
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        grid_data, lasers, targets, blocks = read_bff_file(file_path)
+        for ordering in orderings:
+            solver = Solver(Grid(grid_data, targets), blocks, lasers,
+                            targets, precheck=precheck, ordering=ordering)
+            start = time.perf_counter()
+            solver.solve()
+            elapsed = time.perf_counter() - start
+            print(f"{name:<16}{ordering:>10}{solver.node_count:>10}"
+                  f"{elapsed:>10.3f}")
+
+
+def simulate_cost(file_paths, calls=2000):
+    """
+    Print the time and the peak memory allocated by one simulate()
+    call on the solution of each puzzle, and the time of one call
+    that stops once the targets are hit.
+
+    Parameters:
+    file_paths : list of str
+        The BFF files to solve.
+    calls : int
+        The number of timed simulate() calls.
+    """
+    print(f"{'puzzle':<16}{'us/call':>10}{'peak bytes':>12}"
+          f"{'early exit us/call':>20}")
+    for file_path in file_paths:
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        grid_data, lasers, targets, blocks = read_bff_file(file_path)
+        grid = Grid(grid_data, targets)
+        Solver(grid, blocks, lasers, targets, precheck=True,
+               ordering='beam').solve()
+        solution = [Block(value, (x, y))
+                    for y, row in enumerate(grid.expanded_grid)
+                    for x, value in enumerate(row)
+                    if x % 2 == 1 and y % 2 == 1 and value in 'ABC']
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            simulate(grid, lasers, solution)
+        elapsed = (time.perf_counter() - start) / calls
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        simulate(grid, lasers, solution)
+        peak = tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+
+        required = set(targets)
+        start = time.perf_counter()
+        for _ in range(calls):
+            simulate(grid, lasers, solution, targets=required)
+        early_exit = (time.perf_counter() - start) / calls
+        print(f"{name:<16}{elapsed * 1e6:>10.1f}{peak:>12}"
+              f"{early_exit * 1e6:>20.1f}")
+
+
+def run_version1(file_path):
+    """
+    Solve a puzzle once with main_version1.solve.
+
+    Parameters:
+    file_path : str
+        The path to the BFF file containing the lazor puzzle data.
+
+    Returns:
+    tuple
+        (solved, seconds, nodes), nodes being the number of
+        candidate grids checked, up to the solution if there is one.
+    """
+    grid, lazors, targets, blocks = main_version1.read_bff_file(file_path)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        name = os.path.join(output_dir, 'solution')
+        start = time.perf_counter()
+        grids = main_version1.generate_possible_grids(grid, blocks)
+        solution = main_version1.solve(grids, lazors, targets, name)
+        elapsed = time.perf_counter() - start
+
+    # solve_all takes the grids from the generator a whole chunk at a
+    # time, so the grids are counted again, in the same order, up to
+    # the first one that solves the puzzle
+    nodes = 0
+    for candidate in main_version1.generate_possible_grids(grid, blocks):
+        nodes += 1
+        if candidate == solution:
+            break
+    return solution is not None, elapsed, nodes
+
+
+def run_version2(file_path):
+    """
+    Solve a puzzle once with main_version2.Solver.
+
+    Parameters:
+    file_path : str
+        The path to the BFF file containing the lazor puzzle data.
+
+    Returns:
+    tuple
+        (solved, seconds, nodes), nodes being the
+        number of recursive_solve calls.
+    """
+    grid_data, lasers, targets, blocks = read_bff_file(file_path)
+    start = time.perf_counter()
+    solver = Solver(Grid(grid_data, targets), blocks, lasers, targets)
+    solution = solver.solve()
+    elapsed = time.perf_counter() - start
+    return solution is not None, elapsed, solver.node_count
+
+
+# Solvers of the benchmark suite, by version name
+VERSIONS = {'v1': run_version1, 'v2': run_version2}
+
+
+def run_case(file_path, version, warmup=1, repeat=5):
+    """
+    Time one solver on one puzzle, in a process of its own so
+    that the peak RSS only covers this puzzle.
+
+    Parameters:
+    file_path : str
+        The path to the BFF file containing the lazor puzzle data.
+    version : str
+        The solver to run, a key of VERSIONS.
+    warmup : int
+        The number of untimed runs first.
+    repeat : int
+        The number of timed runs.
+
+    Returns:
+    dict
+        The puzzle, version, solved flag, node count, the wall time
+        of each run with their minimum and median, and the peak RSS
+        of the process in kilobytes (None without resource).
+    """
+    run = VERSIONS[version]
+    for _ in range(warmup):
+        run(file_path)
+    times = []
+    for _ in range(repeat):
+        solved, elapsed, nodes = run(file_path)
+        times.append(round(elapsed, 6))
+
+    peak_rss = None
+    if resource is not None:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            peak_rss //= 1024  # bytes on macOS, kilobytes on Linux
+    return {'puzzle': os.path.splitext(os.path.basename(file_path))[0],
+            'version': version, 'solved': solved, 'nodes': nodes,
+            'min_seconds': min(times),
+            'median_seconds': round(statistics.median(times), 6),
+            'times': times, 'peak_rss_kb': peak_rss}
+
+
+def environment():
+    """
+    Describe where the suite runs, so that results
+    from different machines are not compared by mistake.
+
+    Returns:
+    dict
+        The git commit, Python version, platform and
+        whether NumPy is installed for main_version1.
+    """
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': main_version1.np is not None}
+
+
+def benchmark_suite(file_paths, versions, warmup=1, repeat=5,
+                    output_file='benchmark_results.json'):
+    """
+    Run every solver on every puzzle and write the results as JSON.
+
+    Each case runs in a fresh process, one at a time, so that the
+    cases do not share caches or compete for cores.
+
+    Parameters:
+    file_paths : list of str
+        The BFF files to solve.
+    versions : list of str
+        The solvers to run, keys of VERSIONS.
+    warmup : int
+        The number of untimed runs of each case.
+    repeat : int
+        The number of timed runs of each case.
+    output_file : str
+        The JSON file to write the results to.
+
+    Returns:
+    dict
+        The environment and the results of each case,
+        as written to the output file.
+    """
+    print(f"{'puzzle':<16}{'version':>8}{'solved':>8}{'nodes':>10}"
+          f"{'min (s)':>10}{'median (s)':>12}{'peak RSS (kB)':>15}")
+    results = []
+    for file_path in file_paths:
+        for version in versions:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                case = executor.submit(run_case, file_path, version,
+                                       warmup, repeat).result()
+            results.append(case)
+            print(f"{case['puzzle']:<16}{version:>8}{str(case['solved']):>8}"
+                  f"{case['nodes']:>10}{case['min_seconds']:>10.3f}"
+                  f"{case['median_seconds']:>12.3f}"
+                  f"{str(case['peak_rss_kb']):>15}")
+
+    report = {'environment': environment(), 'warmup': warmup,
+              'repeat': repeat, 'results': results}
+    with open(output_file, 'w') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+        file.write('\n')
+    print(f"Results written to {output_file}")
+    return report
+
+
+def compare_results(old_file, new_file, threshold=1.2):
+    """
+    Compare two result files of benchmark_suite and
+    print the cases that got slower or changed.
+
+    A case is a regression if it got slower than the threshold,
+    if whether it is solved changed, or if it needs more nodes.
+    Fewer nodes are flagged too, but are not a regression.
+
+    Parameters:
+    old_file : str
+        The results of the reference commit.
+    new_file : str
+        The results to check.
+    threshold : float
+        The ratio of median times above which a case is
+        reported as a regression.
+
+    Returns:
+    list of str
+        The names of the regressed cases, 'puzzle/version'.
+    """
+    with open(old_file) as file:
+        old = {(case['puzzle'], case['version']): case
+               for case in json.load(file)['results']}
+    with open(new_file) as file:
+        new = {(case['puzzle'], case['version']): case
+               for case in json.load(file)['results']}
+
+    print(f"{'case':<20}{'old (s)':>10}{'new (s)':>10}{'ratio':>8}"
+          f"{'old nodes':>12}{'new nodes':>12}")
+    regressions = []
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        name = '/'.join(key)
+        ratio = (after['median_seconds'] / before['median_seconds']
+                 if before['median_seconds'] > 0 else 1.0)
+        flags = []
+        if ratio > threshold:
+            flags.append('SLOWER')
+        if after['solved'] != before['solved']:
+            flags.append('SOLVED CHANGED')
+        if after['nodes'] > before['nodes']:
+            flags.append('MORE NODES')
+        if flags:
+            regressions.append(name)
+        if after['nodes'] < before['nodes']:
+            flags.append('FEWER NODES')
+        print(f"{name:<20}{before['median_seconds']:>10.3f}"
+              f"{after['median_seconds']:>10.3f}{ratio:>8.2f}"
+              f"{before['nodes']:>12}{after['nodes']:>12}"
+              f"  {' '.join(flags)}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the speedup of the process-pool search.")
+    parser.add_argument("bff_files", nargs="*",
+                        help="the .bff files to solve, mad_7 and yarn_5 "
+                             "by default, every board with --suite")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="numbers of processes to compare")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of timed runs for each setting")
+    parser.add_argument("--permutations", action="store_true",
+                        help="compare the block order enumerations "
+                             "of main_version1 instead")
+    parser.add_argument("--combinations", type=int, default=100,
+                        help="number of combinations of positions "
+                             "gone through by --permutations")
+    parser.add_argument("--precheck", action="store_true",
+                        help="compare the node counts of recursive_solve "
+                             "without and with the reachability precheck")
+    parser.add_argument("--orderings", nargs="+", choices=sorted(ORDERINGS),
+                        help="compare the node counts of recursive_solve "
+                             "for these orderings")
+    parser.add_argument("--simulate", action="store_true",
+                        help="time one simulate() call on the solution "
+                             "of each puzzle, measure its allocations and "
+                             "time it with the early exit")
+    parser.add_argument("--suite", action="store_true",
+                        help="time main_version1 and main_version2 on "
+                             "every board and write the results as JSON")
+    parser.add_argument("--versions", nargs="+", choices=sorted(VERSIONS),
+                        default=sorted(VERSIONS),
+                        help="solvers run by --suite")
+    parser.add_argument("--warmup", type=int, default=1,
+                        help="number of untimed runs of each --suite case")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="the JSON file written by --suite")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two JSON files written by --suite")
+    args = parser.parse_args()
+    if args.compare:
+        regressions = compare_results(*args.compare)
+        sys.exit(1 if regressions else 0)
+    if args.suite:
+        benchmark_suite(args.bff_files or CORPUS, args.versions,
+                        args.warmup, args.repeat, args.output)
+        sys.exit()
+
+    args.bff_files = args.bff_files or ["./Lazor data/mad_7.bff",
+                                        "./Lazor data/yarn_5.bff"]
+    if args.permutations:
+        permutation_cost(args.bff_files, args.combinations)
+    elif args.simulate:
+        simulate_cost(args.bff_files)
+    elif args.orderings:
+        ordering_node_counts(args.bff_files, args.orderings, args.precheck)
+    elif args.precheck:
+        precheck_node_counts(args.bff_files)
+    else:
+        parallel_speedup(args.bff_files, args.workers, args.repeat)
@@ -0,0 +1,653 @@
+import heapq
+
+try:
+    from pysat.solvers import Solver as PySatSolver
+except ImportError:  # the built-in CDCL engine is used instead
+    PySatSolver = None
+
+
+def turn(position, direction):
+    """
+    Get the direction of a laser turned by a block at a point.
+
+    Parameters:
+    position : tuple of int
+        The (x, y) coordinates of the laser.
+    direction : tuple of int
+        The (dx, dy) direction vector of the laser.
+
+    Returns:
+    tuple of int
+        The reflected direction, x is turned on the left or right
+        of a block and y on its top or bottom.
+    """
+    dx, dy = direction
+    if position[0] % 2 == 0:
+        return -dx, dy
+    return dx, -dy
+
+
+class CDCL:
+    """
+    A small conflict-driven clause learning SAT solver.
+
+    Variables are numbered from 1 and literals are signed integers,
+    as in the DIMACS format. Clauses can be added between calls to
+    solve, the learnt clauses are kept.
+    """
+
+    def __init__(self):
+        self.num_vars = 0
+        self.clauses = []
+        self.watches = {}
+        # Per variable: 1 true, -1 false, 0 unassigned
+        self.value = [0]
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.phase = [False]
+        self.order = []
+        self.var_inc = 1.0
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.unsat = False
+
+    def new_var(self):
+        """
+        Create a new variable.
+
+        Returns:
+        int
+            The number of the variable.
+        """
+        self.num_vars += 1
+        self.value.append(0)
+        self.level.append(0)
+        self.reason.append(None)
+        self.activity.append(0.0)
+        self.phase.append(False)
+        heapq.heappush(self.order, (0.0, self.num_vars))
+        return self.num_vars
+
+    def lit_value(self, lit):
+        value = self.value[abs(lit)]
+        return value if lit > 0 else -value
+
+    def enqueue(self, lit, reason):
+        var = abs(lit)
+        self.value[var] = 1 if lit > 0 else -1
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(lit)
+
+    def add_clause(self, lits):
+        """
+        Add a clause, simplified by the level 0 assignments.
+
+        Parameters:
+        lits : list of int
+            The literals of the clause.
+        """
+        self.backtrack(0)
+        clause = []
+        for lit in lits:
+            if -lit in clause or self.lit_value(lit) == 1:
+                return  # always satisfied
+            if lit not in clause and self.lit_value(lit) == 0:
+                clause.append(lit)
+
+        if not clause:
+            self.unsat = True
+        elif len(clause) == 1:
+            self.enqueue(clause[0], None)
+        else:
+            self.attach(clause)
+
+    def attach(self, clause):
+        self.clauses.append(clause)
+        index = len(self.clauses) - 1
+        self.watches.setdefault(clause[0], []).append(index)
+        self.watches.setdefault(clause[1], []).append(index)
+        return index
+
+    def propagate(self):
+        """
+        Propagate the unit clauses with two watched literals.
+
+        Returns:
+        int or None
+            The index of a conflicting clause, or None.
+        """
+        while self.qhead < len(self.trail):
+            false_lit = -self.trail[self.qhead]
+            self.qhead += 1
+            watchers = self.watches.get(false_lit, [])
+            kept = []
+            for i, index in enumerate(watchers):
+                clause = self.clauses[index]
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self.lit_value(clause[0]) == 1:
+                    kept.append(index)
+                    continue
+
+                # Look for another literal to watch
+                for k in range(2, len(clause)):
+                    if self.lit_value(clause[k]) != -1:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches.setdefault(clause[1], []).append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if self.lit_value(clause[0]) == -1:
+                        kept.extend(watchers[i + 1:])
+                        self.watches[false_lit] = kept
+                        self.qhead = len(self.trail)
+                        return index
+                    self.enqueue(clause[0], index)
+            self.watches[false_lit] = kept
+        return None
+
+    def bump(self, var):
+        self.activity[var] += self.var_inc
+        if self.activity[var] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.var_inc *= 1e-100
+            self.order = [(-self.activity[v], v)
+                          for v in range(1, self.num_vars + 1)]
+            heapq.heapify(self.order)
+        elif self.value[var] == 0:
+            heapq.heappush(self.order, (-self.activity[var], var))
+
+    def analyze(self, conflict):
+        """
+        Learn the first unique implication point clause of a conflict.
+
+        Parameters:
+        conflict : int
+            The index of the conflicting clause.
+
+        Returns:
+        tuple
+            (learnt, level), the learnt clause with its asserting
+            literal first, and the level to go back to.
+        """
+        current_level = len(self.trail_lim)
+        learnt = [None]
+        seen = set()
+        counter = 0
+        lit = None
+        index = len(self.trail) - 1
+        clause = self.clauses[conflict]
+
+        while True:
+            for other in (clause if lit is None else clause[1:]):
+                var = abs(other)
+                if var not in seen and self.level[var] > 0:
+                    seen.add(var)
+                    self.bump(var)
+                    if self.level[var] >= current_level:
+                        counter += 1
+                    else:
+                        learnt.append(other)
+
+            # Next literal of the current level on the trail
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            seen.discard(abs(lit))
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.clauses[self.reason[abs(lit)]]
+
+        learnt[0] = -lit
+        if len(learnt) == 1:
+            return learnt, 0
+
+        # Watch the literal of the highest level after the first one
+        highest = max(range(1, len(learnt)),
+                      key=lambda i: self.level[abs(learnt[i])])
+        learnt[1], learnt[highest] = learnt[highest], learnt[1]
+        return learnt, self.level[abs(learnt[1])]
+
+    def backtrack(self, level):
+        if len(self.trail_lim) <= level:
+            return
+        start = self.trail_lim[level]
+        for lit in self.trail[start:]:
+            var = abs(lit)
+            self.value[var] = 0
+            self.reason[var] = None
+            self.phase[var] = lit > 0
+            heapq.heappush(self.order, (-self.activity[var], var))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def pick_branch(self):
+        while self.order:
+            _, var = heapq.heappop(self.order)
+            if self.value[var] == 0:
+                return var
+        return None
+
+    def solve(self):
+        """
+        Look for an assignment satisfying every clause.
+
+        Returns:
+        list of bool or None
+            The value of each variable, indexed by its number,
+            or None if the clauses cannot all be satisfied.
+        """
+        if self.unsat:
+            return None
+        self.backtrack(0)
+
+        conflicts = 0
+        restart_limit = 100
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                if not self.trail_lim:
+                    self.unsat = True
+                    return None
+                learnt, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learnt) == 1:
+                    self.enqueue(learnt[0], None)
+                else:
+                    self.enqueue(learnt[0], self.attach(learnt))
+                self.var_inc /= 0.95
+
+                conflicts += 1
+                if conflicts >= restart_limit:
+                    self.backtrack(0)
+                    conflicts = 0
+                    restart_limit = int(restart_limit * 1.5)
+                continue
+
+            var = self.pick_branch()
+            if var is None:
+                model = [value == 1 for value in self.value]
+                self.backtrack(0)
+                return model
+            self.trail_lim.append(len(self.trail))
+            self.enqueue(var if self.phase[var] else -var, None)
+
+
+class PySatBackend:
+    """
+    Wrap a pip-installed PySAT solver in the interface of CDCL.
+    """
+
+    def __init__(self, name='minisat22'):
+        self.solver = PySatSolver(name=name)
+        self.num_vars = 0
+
+    def new_var(self):
+        self.num_vars += 1
+        return self.num_vars
+
+    def add_clause(self, lits):
+        self.solver.add_clause(lits)
+
+    def solve(self):
+        if not self.solver.solve():
+            return None
+        model = [False] * (self.num_vars + 1)
+        for lit in self.solver.get_model():
+            if 0 < lit <= self.num_vars:
+                model[lit] = True
+        return model
+
+
+class ConstraintSolver:
+
+    def __init__(self, grid, blocks, lasers, targets, backend=None):
+        """
+        Initializes a new instance of the ConstraintSolver class.
+
+        The puzzle is encoded as clauses over two kinds of variables:
+        the block type of each free position, and whether each laser
+        state (position, direction) is reached. The clauses say that
+        each position holds at most one block, that the inventory is
+        used exactly, that a reached state reaches the states its
+        block sends it to, that a reached state is sent there by a
+        reached state, and that every target lies on a reached segment.
+
+        A closed loop of states can support itself in these clauses,
+        so each model is checked by tracing the lasers. A model that
+        misses a target is ruled out, together with every placement
+        that agrees with it on the positions its lasers checked.
+
+        Parameters:
+        grid : Grid
+            The game grid containing the layout of blocks and targets,
+            with no block placed yet.
+        blocks : dict
+            A dictionary containing the available block types
+            ('A', 'B', 'C') and their quantities.
+        lasers : list of Laser
+            A list of Laser objects representing the lasers in the puzzle.
+        targets : list of tuple
+            A list of tuples representing the target points'
+            coordinates (x, y) on the grid.
+        backend : str or None
+            'cdcl' for the built-in engine, 'pysat' for PySAT,
+            or None for PySAT when it is installed.
+        """
+        self.grid = grid
+        self.blocks = blocks
+        self.lasers = lasers
+        self.targets = targets
+        if backend is None:
+            backend = 'pysat' if PySatSolver is not None else 'cdcl'
+        if backend == 'pysat' and PySatSolver is None:
+            raise ValueError("The 'pysat' backend needs the python-sat "
+                             "package.")
+        self.backend = backend
+        # Number of models checked by tracing the lasers
+        self.iterations = 0
+
+        self.free_positions = list(grid.free_positions)
+        self.fixed_blocks = {}
+        for y, row in enumerate(grid.expanded_grid):
+            for x, value in enumerate(row):
+                if (x % 2 == 1 and y % 2 == 1 and value in 'ABC'
+                        and (x, y) not in grid.free_index):
+                    self.fixed_blocks[(x, y)] = value
+
+    def checked_cell(self, position, direction):
+        """
+        Get the position a laser at a point looks at for a block,
+        in the same order as trace_beams.
+
+        Returns:
+        tuple of int or None
+            A free position or a fixed block, or None.
+        """
+        x, y = position
+        dx, dy = direction
+        for cell in ((x + dx, y), (x, y + dy)):
+            if cell in self.grid.free_index or cell in self.fixed_blocks:
+                return cell
+        return None
+
+    def transitions(self, position, direction):
+        """
+        List the states a laser arriving at a point may leave it in.
+
+        Parameters:
+        position : tuple of int
+            The (x, y) coordinates of the point.
+        direction : tuple of int
+            The (dx, dy) direction the laser arrives with.
+
+        Returns:
+        tuple
+            (cell, moves) where cell is the free position deciding
+            the moves, or None, and moves is a list of
+            (state, condition) pairs. The condition is None when the
+            move always happens, 'pass' when it needs an empty
+            position or a refract block, and 'turn' when it needs a
+            reflect or a refract block.
+        """
+        cell = self.checked_cell(position, direction)
+        straight = (position, direction)
+        turned = (position, turn(position, direction))
+        if cell is None:
+            return None, [(straight, None)]
+        if cell in self.fixed_blocks:
+            block_type = self.fixed_blocks[cell]
+            if block_type == 'A':
+                return None, [(turned, None)]
+            if block_type == 'C':
+                return None, [(straight, None), (turned, None)]
+            return None, []
+        return cell, [(straight, 'pass'), (turned, 'turn')]
+
+    def jump(self, state):
+        if state in self.grid.jump_table:
+            return self.grid.jump_table[state]
+        return self.grid.next_stop(*state)
+
+    def encode(self, sat):
+        """
+        Add the clauses of the puzzle to a SAT solver.
+
+        Parameters:
+        sat : CDCL or PySatBackend
+            The solver to add the clauses to.
+
+        Returns:
+        bool
+            False if some target lies on no segment any laser could
+            follow, so that the puzzle has no solution.
+        """
+        self.block_vars = {(cell, block_type): sat.new_var()
+                           for cell in self.free_positions
+                           for block_type in 'ABC'}
+
+        # Every state some placement could reach, with the edges
+        # (previous state or None for a laser source, condition, cell)
+        incoming = {}
+        stack = []
+        for laser in self.lasers:
+            cell, moves = self.transitions(laser.position, laser.direction)
+            for state, condition in moves:
+                incoming.setdefault(state, []).append(
+                    (None, condition, cell))
+                stack.append(state)
+        seen = set()
+        while stack:
+            state = stack.pop()
+            if state in seen:
+                continue
+            seen.add(state)
+            stop, _ = self.jump(state)
+            if stop is None:
+                continue
+            cell, moves = self.transitions(stop, state[1])
+            for next_state, condition in moves:
+                incoming.setdefault(next_state, []).append(
+                    (state, condition, cell))
+                stack.append(next_state)
+
+        self.state_vars = {state: sat.new_var() for state in incoming}
+
+        def blocks_at(cell):
+            return [self.block_vars[(cell, b)] for b in 'ABC']
+
+        for state, edges in incoming.items():
+            reached = self.state_vars[state]
+            supports = []
+            for previous, condition, cell in edges:
+                before = [] if previous is None \
+                    else [-self.state_vars[previous]]
+                # Forward: a reached state reaches what it is sent to
+                if condition is None:
+                    sat.add_clause(before + [reached])
+                elif condition == 'pass':
+                    sat.add_clause(before + [self.block_vars[(cell, 'A')],
+                                             self.block_vars[(cell, 'B')],
+                                             reached])
+                else:
+                    sat.add_clause(before + [-self.block_vars[(cell, 'A')],
+                                             reached])
+                    sat.add_clause(before + [-self.block_vars[(cell, 'C')],
+                                             reached])
+
+                # Backward: a reached state needs a reached sender
+                if condition is None:
+                    if previous is None:
+                        supports = None  # always reached
+                        continue
+                    if supports is not None:
+                        supports.append(self.state_vars[previous])
+                    continue
+                if supports is None:
+                    continue
+                support = sat.new_var()
+                if previous is not None:
+                    sat.add_clause([-support, self.state_vars[previous]])
+                if condition == 'pass':
+                    sat.add_clause([-support, -self.block_vars[(cell, 'A')]])
+                    sat.add_clause([-support, -self.block_vars[(cell, 'B')]])
+                else:
+                    sat.add_clause([-support, self.block_vars[(cell, 'A')],
+                                    self.block_vars[(cell, 'C')]])
+                supports.append(support)
+            if supports is not None:
+                sat.add_clause([-reached] + supports)
+
+        # Every target lies on a reached segment
+        for target in self.targets:
+            segments = [self.state_vars[state] for state in incoming
+                        if target in self.jump(state)[1]]
+            if not segments:
+                return False
+            sat.add_clause(segments)
+
+        # At most one block on each position
+        for cell in self.free_positions:
+            a, b, c = blocks_at(cell)
+            sat.add_clause([-a, -b])
+            sat.add_clause([-a, -c])
+            sat.add_clause([-b, -c])
+
+        # The inventory is used exactly
+        for block_type in 'ABC':
+            lits = [self.block_vars[(cell, block_type)]
+                    for cell in self.free_positions]
+            count = self.blocks.get(block_type, 0)
+            if count > len(lits):
+                return False
+            add_at_most(sat, lits, count)
+            add_at_most(sat, [-lit for lit in lits], len(lits) - count)
+        return True
+
+    def trace(self, placement):
+        """
+        Trace the lasers for a placement.
+
+        Parameters:
+        placement : dict
+            The block type placed on each free position that has one.
+
+        Returns:
+        tuple
+            (hit_targets, checked_cells), the targets passed and
+            the free positions the lasers looked at.
+        """
+        hit_targets = set()
+        checked_cells = set()
+        visited = set()
+
+        def leave(position, direction):
+            cell, moves = self.transitions(position, direction)
+            if cell is None:
+                return [state for state, _ in moves]
+            checked_cells.add(cell)
+            block_type = placement.get(cell)
+            return [state for state, condition in moves
+                    if (condition == 'pass' and block_type in (None, 'C'))
+                    or (condition == 'turn' and block_type in ('A', 'C'))]
+
+        stack = []
+        for laser in self.lasers:
+            stack.extend(leave(laser.position, laser.direction))
+        while stack:
+            state = stack.pop()
+            if state in visited:
+                continue
+            visited.add(state)
+            stop, passed_targets = self.jump(state)
+            hit_targets.update(passed_targets)
+            if stop is not None:
+                stack.extend(leave(stop, state[1]))
+        return hit_targets, checked_cells
+
+    def solve(self):
+        """
+        Solve the lazor puzzle and find a valid solution.
+
+        Returns:
+        list of tuple or None
+            A list of tuples representing the placed blocks'
+            types and positions (block_type, (x, y)).
+            Returns None if no valid solution is found.
+        """
+        sat = PySatBackend() if self.backend == 'pysat' else CDCL()
+        if not self.encode(sat):
+            return None
+
+        self.iterations = 0
+        while True:
+            model = sat.solve()
+            if model is None:
+                return None
+            self.iterations += 1
+
+            placement = {cell: block_type
+                         for (cell, block_type), var
+                         in self.block_vars.items() if model[var]}
+            hit_targets, checked_cells = self.trace(placement)
+            if all(target in hit_targets for target in self.targets):
+                placed_blocks = []
+                for cell in self.free_positions:
+                    if cell in placement:
+                        self.grid.place_block(cell, placement[cell])
+                        placed_blocks.append((placement[cell], cell))
+                return placed_blocks
+
+            # Rule out every placement that agrees with this one
+            # on the positions the lasers looked at
+            nogood = []
+            for cell in checked_cells:
+                if cell in placement:
+                    nogood.append(-self.block_vars[(cell, placement[cell])])
+                else:
+                    nogood.extend(self.block_vars[(cell, b)] for b in 'ABC')
+            sat.add_clause(nogood)
+
+
+def add_at_most(sat, lits, k):
+    """
+    Add clauses saying that at most k of the literals are true,
+    with the sequential counter encoding.
+
+    Parameters:
+    sat : CDCL or PySatBackend
+        The solver to add the clauses to.
+    lits : list of int
+        The literals to count.
+    k : int
+        The largest number of them that may be true.
+    """
+    n = len(lits)
+    if k >= n:
+        return
+    if k == 0:
+        for lit in lits:
+            sat.add_clause([-lit])
+        return
+
+    # counter[i][j] is true if at least j + 1 of the first i + 1
+    # literals are true
+    counter = [[sat.new_var() for _ in range(k)] for _ in range(n - 1)]
+    sat.add_clause([-lits[0], counter[0][0]])
+    for j in range(1, k):
+        sat.add_clause([-counter[0][j]])
+    for i in range(1, n - 1):
+        sat.add_clause([-lits[i], counter[i][0]])
+        sat.add_clause([-counter[i - 1][0], counter[i][0]])
+        for j in range(1, k):
+            sat.add_clause([-lits[i], -counter[i - 1][j - 1],
+                            counter[i][j]])
+            sat.add_clause([-counter[i - 1][j], counter[i][j]])
+        sat.add_clause([-lits[i], -counter[i - 1][k - 1]])
+    sat.add_clause([-lits[n - 1], -counter[n - 2][k - 1]])
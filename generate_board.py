@@ -0,0 +1,236 @@
+import argparse
+import os
+import random
+
+from main_version2 import Block, Grid, LaserSpec, simulate
+
+
+def parse_counts(items):
+    """
+    Parse block counts given on the command line.
+
+    Parameters:
+    items : list of str
+        Counts such as 'A=6', 'C=1'.
+
+    Returns:
+    dict
+        The count of each block type 'A', 'B' and 'C'.
+    """
+    counts = {'A': 0, 'B': 0, 'C': 0}
+    for item in items or []:
+        block_type, _, count = item.partition('=')
+        if block_type not in counts or not count.isdigit():
+            raise ValueError(f"Expected a count such as 'A=3', got '{item}'.")
+        counts[block_type] = int(count)
+    return counts
+
+
+def random_laser(rng, width, height):
+    """
+    Pick a laser start on a point between two blocks, with a
+    diagonal direction that points into the grid.
+
+    Parameters:
+    rng : random.Random
+        The random number generator.
+    width, height : int
+        The size of the board in blocks.
+
+    Returns:
+    tuple
+        The (x, y) position and (dx, dy) direction of the laser.
+    """
+    while True:
+        x = rng.randrange(2 * width + 1)
+        y = rng.randrange(2 * height + 1)
+        if (x + y) % 2 == 0:
+            continue
+        dx = rng.choice((1, -1))
+        dy = rng.choice((1, -1))
+        if 0 <= x + dx <= 2 * width and 0 <= y + dy <= 2 * height:
+            return (x, y), (dx, dy)
+
+
+def trace_hits(raw_grid, lasers):
+    """
+    Get the points the lasers pass with the blocks of a raw grid.
+
+    Parameters:
+    raw_grid : list of list of str
+        The board, with the blocks as 'A', 'B' or 'C'.
+    lasers : list of tuple
+        The (x, y) position and (dx, dy) direction of each laser.
+
+    Returns:
+    set of tuple
+        The points (x, y) passed by the lasers.
+    """
+    # Every point counts as a target of this trace
+    points = [(x, y) for y in range(2 * len(raw_grid) + 1)
+              for x in range(2 * len(raw_grid[0]) + 1) if (x + y) % 2 == 1]
+    grid = Grid(raw_grid, points)
+    blocks = [Block(value, (2 * x + 1, 2 * y + 1))
+              for y, row in enumerate(raw_grid)
+              for x, value in enumerate(row) if value in 'ABC']
+    return simulate(grid, [LaserSpec(position, direction)
+                           for position, direction in lasers], blocks)
+
+
+def generate_board(width, height, blocks, fixed_blocks=None, lasers=1,
+                   targets=5, no_block=0, seed=None, attempts=1000):
+    """
+    Generate a solvable lazor puzzle.
+
+    The board gets random 'x' cells and fixed blocks, then a random
+    solution uses the whole inventory. The targets are picked among
+    the points the lasers pass with that solution, first among those
+    they do not pass without the solution blocks, so that the puzzle
+    needs them. Placing the solution always solves the puzzle.
+
+    Parameters:
+    width, height : int
+        The size of the board in blocks.
+    blocks : dict
+        The inventory of movable blocks 'A', 'B' and 'C'.
+    fixed_blocks : dict or None
+        The number of fixed blocks of each type.
+    lasers : int
+        The number of lasers.
+    targets : int
+        The number of targets.
+    no_block : int
+        The number of cells where no block can be placed.
+    seed : int or None
+        The seed of the random number generator.
+    attempts : int
+        The number of random solutions tried before giving up.
+
+    Returns:
+    dict
+        The 'grid' rows, 'lasers', 'targets' and 'blocks' of the
+        puzzle, and the 'solution' as (block_type, (x, y)) tuples
+        on the expanded grid.
+
+    Raises:
+    ValueError
+        If the board is too small for the blocks, or if no solution
+        tried passes enough points for the targets.
+    """
+    rng = random.Random(seed)
+    fixed_blocks = fixed_blocks or {}
+    fixed = [b for b in 'ABC' for _ in range(fixed_blocks.get(b, 0))]
+    movable = [b for b in 'ABC' for _ in range(blocks.get(b, 0))]
+    cells = [(x, y) for y in range(height) for x in range(width)]
+    if len(fixed) + no_block + len(movable) > len(cells):
+        raise ValueError("The board is too small for the blocks.")
+
+    for _ in range(attempts):
+        raw_grid = [['o'] * width for _ in range(height)]
+        chosen = rng.sample(cells, len(fixed) + no_block + len(movable))
+        for (x, y), value in zip(chosen, fixed + ['x'] * no_block):
+            raw_grid[y][x] = value
+        laser_specs = [random_laser(rng, width, height)
+                       for _ in range(lasers)]
+
+        # Points the puzzle can already reach without the solution
+        hits_without = trace_hits(raw_grid, laser_specs)
+
+        solved_grid = [row[:] for row in raw_grid]
+        solution = []
+        for (x, y), block_type in zip(chosen[len(fixed) + no_block:],
+                                      movable):
+            solved_grid[y][x] = block_type
+            solution.append((block_type, (2 * x + 1, 2 * y + 1)))
+        hits = trace_hits(solved_grid, laser_specs)
+
+        # Laser starts are not passed, so they never make targets
+        needed = sorted(hits - hits_without)
+        others = sorted(hits & hits_without)
+        if len(needed) + len(others) < targets:
+            continue
+        rng.shuffle(needed)
+        rng.shuffle(others)
+        picked = (needed + others)[:targets]
+
+        return {'grid': raw_grid, 'lasers': laser_specs,
+                'targets': sorted(picked),
+                'blocks': {b: blocks.get(b, 0) for b in 'ABC'},
+                'solution': sorted(solution, key=lambda item: item[1])}
+
+    raise ValueError(f"No solution tried in {attempts} attempts passes "
+                     f"{targets} points.")
+
+
+def format_bff(puzzle, comment=None):
+    """
+    Write a puzzle in the '.bff' format read by read_bff_file.
+
+    Parameters:
+    puzzle : dict
+        A puzzle as returned by generate_board.
+    comment : str or None
+        A line to put at the top of the file.
+
+    Returns:
+    str
+        The content of the '.bff' file. The solution is given
+        in the comments at the end.
+    """
+    lines = []
+    if comment:
+        lines += [f"# {comment}", ""]
+    lines.append("GRID START")
+    lines += ["   ".join(row) for row in puzzle['grid']]
+    lines += ["GRID STOP", ""]
+    lines += [f"{b} {count}" for b, count in puzzle['blocks'].items()
+              if count > 0]
+    lines.append("")
+    lines += [f"L {x} {y} {dx} {dy}"
+              for (x, y), (dx, dy) in puzzle['lasers']]
+    lines.append("")
+    lines += [f"P {x} {y}" for x, y in puzzle['targets']]
+    lines += ["", "# One solution, as block x y on the expanded grid:"]
+    lines += [f"#   {block_type} {x} {y}"
+              for block_type, (x, y) in puzzle['solution']]
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate solvable lazor puzzles for scaling tests.")
+    parser.add_argument("output",
+                        help="the .bff file to write, numbered when "
+                             "--count is more than 1")
+    parser.add_argument("--size", type=int, nargs=2, default=[8, 8],
+                        metavar=("WIDTH", "HEIGHT"),
+                        help="size of the board in blocks")
+    parser.add_argument("--blocks", nargs="+", default=["A=8", "C=2"],
+                        help="movable blocks, such as A=8 B=1 C=2")
+    parser.add_argument("--fixed", nargs="*", default=[],
+                        help="fixed blocks, such as A=1 B=2")
+    parser.add_argument("--no-block", type=int, default=0,
+                        help="number of cells where no block is allowed")
+    parser.add_argument("--lasers", type=int, default=2,
+                        help="number of lasers")
+    parser.add_argument("--targets", type=int, default=5,
+                        help="number of targets")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first puzzle, the next ones "
+                             "use the following seeds")
+    parser.add_argument("--count", type=int, default=1,
+                        help="number of puzzles to write")
+    args = parser.parse_args()
+
+    stem, extension = os.path.splitext(args.output)
+    for i in range(args.count):
+        seed = args.seed + i
+        puzzle = generate_board(*args.size, parse_counts(args.blocks),
+                                parse_counts(args.fixed), args.lasers,
+                                args.targets, args.no_block, seed)
+        file_path = (args.output if args.count == 1
+                     else f"{stem}_{i}{extension or '.bff'}")
+        with open(file_path, 'w') as file:
+            file.write(format_bff(puzzle, f"Generated by generate_board.py "
+                                          f"with seed {seed}"))
+        print(f"Wrote {file_path}")
@@ -1,6 +1,11 @@
 import itertools
 import os
 
+try:
+    import numpy as np
+except ImportError:  # batch_simulate needs NumPy, solve works without it
+    np = None
+
 
 def read_bff_file(filename):
     """
@@ -272,10 +277,49 @@ def meet_block(lazor, blocks_dict):
     return new_Lazors
 
 
+def multiset_permutations(block_dict):
+    """
+    This function generates every distinct order of the blocks,
+    each one exactly once, without going through the orders
+    that only swap blocks of the same type
+
+    Parameters:
+        block_dict: *dict*
+            number and types of all the blocks to be placed
+
+    Yields:
+        block_order: *tuple*
+            block types in the order they are placed
+    """
+    counts = {b: count for b, count in sorted(block_dict.items())
+              if count > 0}
+    total_blocks = sum(counts.values())
+    block_order = []
+
+    def extend():
+        if len(block_order) == total_blocks:
+            yield tuple(block_order)
+            return
+
+        for b in counts:
+            if counts[b] > 0:
+                counts[b] -= 1
+                block_order.append(b)
+                yield from extend()
+                block_order.pop()
+                counts[b] += 1
+
+    yield from extend()
+
+
 def generate_possible_grids(initial_grid, block_dict):
     """
     This function generates the possible grids with all blocks placed
 
+    The grids are yielded one at a time, so that memory use does not
+    grow with the number of placements and the search can stop as
+    soon as a solution is found.
+
     Parameters:
         initial_grid: *list*
             the original empty grid contains 'x' and 'o'
@@ -283,26 +327,25 @@ def generate_possible_grids(initial_grid, block_dict):
         block_dict: *dict*
             number and types of all the blocks to be placed
 
-    Returns:
-        result_grids: *list*
-           main_version1.py All the possible new grid with blocks placed
+    Yields:
+        new_grid: *list*
+           one possible new grid with blocks placed
     """
 
     empty_positions = [(x, y) for y in range(len(initial_grid))
                        for x in range(len(initial_grid[0]))
                        if initial_grid[y][x] == 'o']
 
-    block_types = sorted([b for b, count in block_dict.items()
-                          for i in range(count)])
-    total_blocks = len(block_types)
+    total_blocks = sum(block_dict.values())
 
-    result_grids = []
+    # the distinct orders of the blocks are the same for every
+    # combination of positions, so they are only computed once
+    block_orders = list(multiset_permutations(block_dict))
 
     # generate all the possible ways of placement
     for positions in itertools.combinations(empty_positions, total_blocks):
 
-        for block_order in set(itertools.permutations(block_types,
-                                                      total_blocks)):
+        for block_order in block_orders:
             # copy the original grid for placement
             new_grid = [row[:] for row in initial_grid]
 
@@ -310,8 +353,7 @@ def generate_possible_grids(initial_grid, block_dict):
                 x, y = position
                 new_grid[y][x] = block_type
 
-            result_grids.append(new_grid)
-    return result_grids
+            yield new_grid
 
 
 def pos_chk(grid, Lazor):
@@ -335,11 +377,13 @@ def pos_chk(grid, Lazor):
             Lazor.position[1] < 0 or Lazor.position[1] >= grid_size[1])
 
 
-def simulate(grid, Lazors, blocks):
+def simulate(grid, Lazors, blocks, targets=None):
     """
     This function simulate the lazor path and finds
     all the passed target points
 
+    The Lazors given are only read, meet_block moves copies of them.
+
     Parameters:
         grid: *list*
             expanded grid
@@ -347,24 +391,16 @@ def simulate(grid, Lazors, blocks):
             position and direction of all the lazors
         blocks: *list*
             all the blocks objects
+        targets: *set*
+            if given, the simulation stops as soon as all these
+            targets are hit
 
     Returns:
         hit_targets: *set*
-            all the positions of passed targets
+            all the positions of passed targets, or only those
+            passed before the simulation stopped
 
     """
-    # original state of each Lazor
-    original_states = [(lazor.position, lazor.direction) for lazor in Lazors]
-
-    def reset_Lazors():
-        """
-        reset Lazors to their original states
-        """
-        for i, lazor in enumerate(Lazors):
-            orig_pos, orig_dir = original_states[i]
-            lazor.position = orig_pos
-            lazor.direction = orig_dir
-
     blocks_dict = {block.position: block for block in blocks}
 
     # initialize
@@ -373,6 +409,10 @@ def simulate(grid, Lazors, blocks):
     # store Lazor positions that hit targets
     hit_targets = set()
 
+    # store (position, direction) states already traced, a lazor
+    # coming back to one of them would only repeat a known path
+    visited = set()
+
     # Initial block interaction check for each Lazor at starting position
     new_Lazors = []
 
@@ -380,7 +420,9 @@ def simulate(grid, Lazors, blocks):
         interaction_results = meet_block(lazor, blocks_dict)
 
         for result in interaction_results:
-            if not pos_chk(grid, result):
+            state = (result.position, result.direction)
+            if not pos_chk(grid, result) and state not in visited:
+                visited.add(state)
                 new_Lazors.append(result)
 
     active_Lazors = new_Lazors
@@ -401,20 +443,133 @@ def simulate(grid, Lazors, blocks):
             interaction_results = meet_block(lazor, blocks_dict)
             for result in interaction_results:
                 if not pos_chk(grid, result):
-                    new_Lazors.append(result)
-
                     # Check if Lazor hits a target
                     if grid[result.position[1]][result.position[0]] == 't':
                         hit_targets.add(result.position)
+                        if targets is not None and targets <= hit_targets:
+                            return hit_targets
+
+                    # Drop lazors caught in a reflect or refract loop
+                    state = (result.position, result.direction)
+                    if state in visited:
+                        continue
+                    visited.add(state)
+                    new_Lazors.append(result)
 
         active_Lazors = new_Lazors
 
-    # After simulation, reset Lazors to their original states
-    reset_Lazors()
-
     return hit_targets
 
 
+def batch_simulate(grids, lazors, targets):
+    """
+    This function simulates the lazor paths on many candidate grids at
+    once, and finds the passed target points of each of them
+
+    All the lazors of all the grids are kept in NumPy arrays of
+    positions and directions, and are moved, checked against the
+    blocks of their own grid and split together at every step. The
+    rules are the same as in simulate and meet_block, for lazors
+    travelling along the edges of the blocks.
+
+    Parameters:
+        grids: *list*
+            K original grids of the same size, with blocks placed,
+            such as the grids yielded by generate_possible_grids
+
+        lazors: *list*
+            lazor positions and directions
+
+        targets: *set*
+            each tuple in the set represents a target point
+
+    Returns:
+        hits: *numpy.ndarray*
+            K x T array of booleans, hits[k, i] is True if the lazors
+            of grid k pass the i-th target of sorted(targets)
+    """
+    raw = np.array(grids)
+    n_grids, raw_height, raw_width = raw.shape
+    height, width = 2 * raw_height + 1, 2 * raw_width + 1
+
+    # block codes of the expanded grids, 1: reflect, 2: opaque,
+    # 3: refract, padded by one point on each side so that the
+    # points looked at by lazors on the border stay in the array
+    blocks = np.zeros((n_grids, height + 2, width + 2), dtype=np.int8)
+    blocks[:, 2:height:2, 2:width:2] = ((raw == 'A') * 1 + (raw == 'B') * 2
+                                        + (raw == 'C') * 3)
+
+    # index of the target at each point, -1 where there is none
+    target_list = sorted(targets)
+    target_index = np.full((height, width), -1, dtype=np.int64)
+    for i, (xt, yt) in enumerate(target_list):
+        target_index[yt, xt] = i
+    hits = np.zeros((n_grids, len(target_list)), dtype=bool)
+
+    # (grid, position, direction) states already traced
+    visited = np.zeros(n_grids * height * width * 4, dtype=bool)
+
+    def meet_blocks(k, x, y, dx, dy):
+        # lazors on a vertical edge look at the block beside them,
+        # lazors on a horizontal edge at the block above or below
+        vertical = x % 2 == 0
+        block_x = np.where(vertical, x + dx, x)
+        block_y = np.where(vertical, y, y + dy)
+        code = blocks[k, block_y + 1, block_x + 1]
+
+        # straight lazors and the part of refracted lazors that passes
+        # go on, reflected lazors and the other part turn
+        go_on = (code == 0) | (code == 3)
+        turn = (code == 1) | (code == 3)
+        turned_dx = np.where(vertical, -dx, dx)[turn]
+        turned_dy = np.where(vertical, dy, -dy)[turn]
+        return (np.concatenate((k[go_on], k[turn])),
+                np.concatenate((x[go_on], x[turn])),
+                np.concatenate((y[go_on], y[turn])),
+                np.concatenate((dx[go_on], turned_dx)),
+                np.concatenate((dy[go_on], turned_dy)))
+
+    def drop_visited(k, x, y, dx, dy):
+        # drop lazors in a state already traced, or twice in this step
+        key = ((k * height + y) * width + x) * 4 + (dx + 1) + (dy + 1) // 2
+        key, first = np.unique(key, return_index=True)
+        new = ~visited[key]
+        visited[key[new]] = True
+        first = first[new]
+        return k[first], x[first], y[first], dx[first], dy[first]
+
+    # every grid starts with the same lazors
+    grid_ids = np.arange(n_grids, dtype=np.int64)
+    k = np.tile(grid_ids, len(lazors))
+    x = np.repeat([lazor.position[0] for lazor in lazors], n_grids)
+    y = np.repeat([lazor.position[1] for lazor in lazors], n_grids)
+    dx = np.repeat([lazor.direction[0] for lazor in lazors], n_grids)
+    dy = np.repeat([lazor.direction[1] for lazor in lazors], n_grids)
+
+    # Initial block interaction check at the starting positions
+    state = meet_blocks(k, x, y, dx, dy)
+    k, x, y, dx, dy = drop_visited(*state)
+
+    while k.size:
+        # Move the lazors and drop the ones out of the grid
+        x = x + dx
+        y = y + dy
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        k, x, y, dx, dy = k[inside], x[inside], y[inside], \
+            dx[inside], dy[inside]
+
+        k, x, y, dx, dy = meet_blocks(k, x, y, dx, dy)
+
+        # Check if lazors hit a target
+        target = target_index[y, x]
+        on_target = target >= 0
+        hits[k[on_target], target[on_target]] = True
+
+        k, x, y, dx, dy = drop_visited(k, x, y, dx, dy)
+
+    return hits
+
+
 def save_grid(grid, filename):
     """
     This function saves the solution as a txt file
@@ -434,13 +589,17 @@ def save_grid(grid, filename):
             file.write(' '.join(row) + '\n')
 
 
-def solve(grids, lazors, targets, filename):
+def solve_all(grids, lazors, targets, cap=None, chunk_size=4096):
     """
-    This function solves the lazor question and save the solution as a txt file
+    This function yields every grid that solves the lazor question
+
+    If NumPy is installed, the grids are checked chunk_size at a time
+    with batch_simulate, otherwise one at a time with simulate.
 
     Parameters:
-        grids:*list*
-            all the possible grid with blocks in
+        grids:*iterable*
+            all the possible grid with blocks in, such as the
+            generator returned by generate_possible_grids
 
         lazors:*list*
             lazor positions and directions
@@ -448,9 +607,35 @@ def solve(grids, lazors, targets, filename):
         targets: *set*
              each tuple in the set represents a target point
 
-        filename:*str*
-            question filename, also the output filename
+        cap:*int*
+            most solutions to yield, None for all of them
+
+        chunk_size:*int*
+            number of grids simulated together, 0 to always
+            use simulate
+
+    Yields:
+        solution: *list*
+            each grid whose lazors hit all the targets
     """
+    if cap is not None and cap <= 0:
+        return
+    found = 0
+
+    if np is not None and chunk_size:
+        grids = iter(grids)
+        while True:
+            chunk = list(itertools.islice(grids, chunk_size))
+            if not chunk:
+                return
+
+            hits = batch_simulate(chunk, lazors, targets)
+            for i in np.flatnonzero(hits.all(axis=1)):
+                yield chunk[i]
+                found += 1
+                if found == cap:
+                    return
+
     for grid in grids:
         expanded_grid = expand_grid(grid, targets)
         blocks_list = []
@@ -461,11 +646,48 @@ def solve(grids, lazors, targets, filename):
                     block = Block(value, (x, y))
                     blocks_list.append(block)
 
-        passed_targets = simulate(expanded_grid, lazors, blocks_list)
+        passed_targets = simulate(expanded_grid, lazors, blocks_list,
+                                  targets)
 
         if targets == passed_targets:
-            save_grid(grid, filename)
-            break
+            yield grid
+            found += 1
+            if found == cap:
+                return
+
+
+def solve(grids, lazors, targets, filename, chunk_size=4096):
+    """
+    This function solves the lazor question and save the solution as a txt file
+
+    Parameters:
+        grids:*iterable*
+            all the possible grid with blocks in, such as the
+            generator returned by generate_possible_grids
+
+        lazors:*list*
+            lazor positions and directions
+
+        targets: *set*
+             each tuple in the set represents a target point
+
+        filename:*str*
+            question filename, also the output filename
+
+        chunk_size:*int*
+            number of grids simulated together, 0 to always
+            use simulate, see solve_all
+
+    Returns:
+        solution: *list*
+            the grid saved as the solution, None if no grid
+            hits all the targets
+    """
+    for grid in solve_all(grids, lazors, targets, 1, chunk_size):
+        save_grid(grid, filename)
+        return grid
+
+    return None
 
 
 if __name__ == "__main__":
@@ -1,5 +1,33 @@
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import copy
+import json
+import multiprocessing
 import threading
 import os
+import time
+
+
+# Integer codes of the points of Grid.cells
+LATTICE = 0   # '+', '-' and '|' points between the blocks
+OPEN = 1      # 'o', a block can be placed here
+NO_BLOCK = 2  # 'x', no block allowed
+REFLECT = 3   # 'A'
+OPAQUE = 4    # 'B'
+REFRACT = 5   # 'C'
+TARGET = 6    # '?'
+CELL_CODES = {'o': OPEN, 'x': NO_BLOCK, 'A': REFLECT,
+              'B': OPAQUE, 'C': REFRACT, '?': TARGET}
+
+# Laser directions, in the order of the packed laser states: a laser
+# at offset i going in DIRECTIONS[d] is the state 4 * i + d, so that
+# d ^ 2 turns dx and d ^ 1 turns dy
+DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+# Cells codes with the blocks taken out, see simulate
+CLEAR_BLOCKS = bytes(OPEN if code in (REFLECT, OPAQUE, REFRACT) else code
+                     for code in range(256))
 
 
 # Define the Block class
@@ -76,8 +104,17 @@ class Block:
         return None
 
 
+# An immutable laser source, which simulate reads like a Laser
+LaserSpec = namedtuple('LaserSpec', ['position', 'direction'])
+
+# The path of one laser on the grid, see trace_path
+BeamPath = namedtuple('BeamPath', ['hit_mask', 'touched_mask', 'states',
+                                   'checkpoints'])
+
+
 # Define the Laser class.
 class Laser:
+    __slots__ = ('position', 'direction', 'active')
 
     def __init__(self, position, direction, active=True):
         """
@@ -132,9 +169,42 @@ class Grid:
             A list of target points' coordinates (x, y) on the grid.
             """
         # Directly call expand_grid with self
+        # The expanded grid is kept as the view used for printing
         self.expanded_grid = self.expand_grid(raw_grid, targets)
         self.targets = {tuple(t): False for t in targets}
 
+        # Each target is one bit of the target masks, in the order given
+        self.target_index = {target: i for i, target
+                             in enumerate(self.targets)}
+
+        # Flat integer copy of the expanded grid, indexed by offset
+        self.height = len(self.expanded_grid)
+        self.width = len(self.expanded_grid[0])
+        self.cells = bytearray(CELL_CODES.get(value, LATTICE)
+                               for row in self.expanded_grid
+                               for value in row)
+
+        # Each position where a block can be placed is one bit of the
+        # placement masks, which hold the placed blocks of each type
+        self.free_positions = self.get_all_empty_positions()
+        self.free_index = {position: i for i, position
+                           in enumerate(self.free_positions)}
+        self.placement_masks = {'A': 0, 'B': 0, 'C': 0}
+        # The bit of each offset of the cells, 0 if it is not free
+        self.free_bits = [0] * len(self.cells)
+        for position, i in self.free_index.items():
+            self.free_bits[self.offset(position)] = 1 << i
+
+        # Placing or removing blocks never changes which cells can hold
+        # one, so the segment-jump table is built once per board. Its
+        # stops are next to every such cell, 'o' cells included, so it
+        # only skips the points next to 'x' cells: on an open board
+        # each jump is one step. The table saves the per-step work of
+        # move() and meet_block(), not the steps themselves.
+        self.jump_table = self.build_jump_table()
+        (self.jump_stops, self.jump_bits, self.check_cells,
+         self.turned_states) = self.build_state_tables()
+
     def expand_grid(self, raw_grid, targets):
         """
         Expands the raw grid into an expanded grid with additional symbols.
@@ -202,14 +272,28 @@ class Grid:
 
         return expanded_grid
 
+    def offset(self, position):
+        """
+        Get the index of a position in the flat cells array.
+
+        Parameters:
+        position : tuple of int
+            The (x, y) coordinates on the expanded grid.
+
+        Returns:
+        int
+            The offset y * width + x.
+        """
+        x, y = position
+        return y * self.width + x
+
     def is_inside(self, position):
         x, y = position
-        return (0 <= x < len(self.expanded_grid[0])
-                and 0 <= y < len(self.expanded_grid))
+        return 0 <= x < self.width and 0 <= y < self.height
 
     def can_place_block(self, position, block):
-        x, y = position
-        return self.is_inside(position) and self.expanded_grid[y][x] == 'o'
+        return (self.is_inside(position)
+                and self.cells[self.offset(position)] == OPEN)
 
     def get_all_empty_positions(self):
         """
@@ -219,25 +303,314 @@ class Grid:
             List[Tuple[int, int]]: A list of tuples
             representing the coordinates of empty positions.
         """
-        empty_positions = []
-        for y, row in enumerate(self.expanded_grid):
-            for x, value in enumerate(row):
-                if value == 'o':
-                    empty_positions.append((x, y))
-        return empty_positions
+        width = self.width
+        return [(i % width, i // width)
+                for i, code in enumerate(self.cells) if code == OPEN]
 
     def place_block(self, position, block_type):
         x, y = position
         if self.can_place_block(position, block_type):
+            self.cells[self.offset(position)] = CELL_CODES[block_type]
             self.expanded_grid[y][x] = block_type
+            self.placement_masks[block_type] |= 1 << self.free_index[position]
             return True
         return False
 
     def remove_block(self, position):
         x, y = position
-        if self.is_inside(position) and self.expanded_grid[y][x] != 'x':
+        # Only blocks placed on free positions can be removed
+        if (position in self.free_index
+                and self.cells[self.offset(position)] != OPEN):
+            block_type = self.expanded_grid[y][x]
+            self.placement_masks[block_type] &= \
+                ~(1 << self.free_index[position])
+            self.cells[self.offset(position)] = OPEN
             self.expanded_grid[y][x] = 'o'
 
+    def placement_key(self, blocks=None):
+        """
+        Get a hashable key of the blocks placed on the grid.
+
+        Parameters:
+        blocks : list of tuple or None
+            Blocks (block_type, (x, y)) on free positions to get the
+            key of instead, such as the best_blocks of a Solver.
+
+        Returns:
+        tuple of int
+            The placement masks of the 'A', 'B' and 'C' blocks.
+        """
+        if blocks is None:
+            return (self.placement_masks['A'], self.placement_masks['B'],
+                    self.placement_masks['C'])
+        masks = {'A': 0, 'B': 0, 'C': 0}
+        for block_type, position in blocks:
+            masks[block_type] |= 1 << self.free_index[position]
+        return masks['A'], masks['B'], masks['C']
+
+    def placements(self, key):
+        """
+        Get the blocks of a placement key.
+
+        Parameters:
+        key : tuple of int
+            The placement masks of the 'A', 'B' and 'C' blocks,
+            as given by placement_key.
+
+        Returns:
+        list of tuple
+            The blocks (block_type, (x, y)), in grid order.
+        """
+        return [(block_type, position)
+                for position in self.free_positions
+                for block_type, mask in zip('ABC', key)
+                if mask >> self.free_index[position] & 1]
+
+    def target_mask(self, points):
+        """
+        Get the mask of the targets among some points.
+
+        Parameters:
+        points : iterable of tuple
+            The (x, y) coordinates of the points.
+
+        Returns:
+        int
+            The bits of the points that are targets.
+        """
+        mask = 0
+        for point in points:
+            if point in self.target_index:
+                mask |= 1 << self.target_index[point]
+        return mask
+
+    def target_set(self, mask):
+        """
+        Get the targets of a target mask.
+
+        Parameters:
+        mask : int
+            The bits of the targets, see target_mask.
+
+        Returns:
+        set of tuple
+            The (x, y) coordinates of the targets.
+        """
+        return {target for target, i in self.target_index.items()
+                if mask >> i & 1}
+
+    def copy(self):
+        """
+        Copy the grid, so that blocks can be placed on the copy
+        without changing this grid.
+
+        Returns:
+        Grid
+            The new grid, sharing the jump table of this one.
+        """
+        new_grid = copy.copy(self)
+        new_grid.expanded_grid = [row[:] for row in self.expanded_grid]
+        new_grid.cells = self.cells[:]
+        new_grid.placement_masks = dict(self.placement_masks)
+        return new_grid
+
+    def can_hold_block(self, position):
+        """
+        Check if a block can ever sit at the given position,
+        either fixed in the grid or placed by the solver.
+
+        Parameters:
+        position : tuple of int
+            The (x, y) coordinates on the expanded grid.
+
+        Returns:
+        bool
+            True if the position is a cell center that is not 'x'.
+        """
+        x, y = position
+        return (x % 2 == 1 and y % 2 == 1 and self.is_inside(position)
+                and self.cells[self.offset(position)] != NO_BLOCK)
+
+    def next_stop(self, position, direction):
+        """
+        Follow a laser in a straight line until it reaches a point
+        where it may meet a block, or until it leaves the grid.
+
+        Parameters:
+        position : tuple of int
+            The (x, y) coordinates the laser starts from.
+        direction : tuple of int
+            The (dx, dy) direction vector of the laser.
+
+        Returns:
+        tuple
+            (stop, passed_targets) where stop is the next position
+            next to a cell that can hold a block, or None if the laser
+            leaves the grid first, and passed_targets is a tuple of the
+            target points crossed on the way, the stop included.
+        """
+        x, y = position
+        dx, dy = direction
+        passed_targets = []
+        while True:
+            x, y = x + dx, y + dy
+            if not self.is_inside((x, y)):
+                return None, tuple(passed_targets)
+            if self.cells[y * self.width + x] == TARGET:
+                passed_targets.append((x, y))
+            # same two points trace_beams looks at
+            if (self.can_hold_block((x + dx, y))
+                    or self.can_hold_block((x, y + dy))):
+                return (x, y), tuple(passed_targets)
+
+    def transform(self, symmetry, position, direction=None):
+        """
+        Apply a reflection or rotation of the board to a point.
+
+        Parameters:
+        symmetry : tuple of int
+            The (a, b, c, d) matrix of the transformation, acting on
+            coordinates taken from the center of the grid.
+        position : tuple of int
+            The (x, y) coordinates on the expanded grid.
+        direction : tuple of int or None
+            The (dx, dy) direction vector of a laser at the point.
+
+        Returns:
+        tuple
+            The transformed position, or the transformed
+            (position, direction) if a direction is given.
+        """
+        a, b, c, d = symmetry
+        u = 2 * position[0] - (self.width - 1)
+        v = 2 * position[1] - (self.height - 1)
+        new_position = ((a * u + b * v + self.width - 1) // 2,
+                        (c * u + d * v + self.height - 1) // 2)
+        if direction is None:
+            return new_position
+        dx, dy = direction
+        return new_position, (a * dx + b * dy, c * dx + d * dy)
+
+    def find_symmetries(self, lasers):
+        """
+        Find the reflections and rotations of the board that map the
+        grid, the targets and the lasers onto themselves. A placement
+        is a solution exactly when its image by one of them is.
+
+        Parameters:
+        lasers : list of Laser
+            The lasers of the puzzle.
+
+        Returns:
+        list of tuple of int
+            The (a, b, c, d) matrices of the symmetries, see transform,
+            without the identity.
+        """
+        symmetries = [(-1, 0, 0, 1), (1, 0, 0, -1), (-1, 0, 0, -1)]
+        if self.width == self.height:
+            symmetries += [(0, 1, 1, 0), (0, -1, -1, 0),
+                           (0, -1, 1, 0), (0, 1, -1, 0)]
+
+        laser_states = {(laser.position, laser.direction)
+                        for laser in lasers}
+        found = []
+        for symmetry in symmetries:
+            if any(self.cells[self.offset(self.transform(symmetry, (x, y)))]
+                   != self.cells[self.offset((x, y))]
+                   for y in range(self.height) for x in range(self.width)):
+                continue
+            if {self.transform(symmetry, *state)
+                    for state in laser_states} != laser_states:
+                continue
+            found.append(symmetry)
+        return found
+
+    def build_jump_table(self):
+        """
+        Precompute the next stop of every laser state on the grid,
+        so that lasers can skip the points next to 'x' cells, where
+        nothing can happen.
+
+        Returns:
+        dict
+            Maps each ((x, y), (dx, dy)) laser state to the
+            (stop, passed_targets) pair given by next_stop.
+        """
+        jump_table = {}
+        for y in range(self.height):
+            for x in range(self.width):
+                # lasers only travel along the edges of the cells
+                if x % 2 == y % 2:
+                    continue
+                for direction in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+                    jump_table[((x, y), direction)] \
+                        = self.next_stop((x, y), direction)
+        return jump_table
+
+    def laser_state(self, position, direction):
+        """
+        Pack a laser state into the integer used by trace_beams.
+
+        Parameters:
+        position : tuple of int
+            The (x, y) coordinates of the laser.
+        direction : tuple of int
+            The (dx, dy) direction vector of the laser.
+
+        Returns:
+        int
+            4 * offset + the index of the direction in DIRECTIONS,
+            or -1 if the laser is outside the grid.
+        """
+        if not self.is_inside(position):
+            return -1
+        dx, dy = direction
+        return 4 * self.offset(position) + 2 * (dx < 0) + (dy < 0)
+
+    def build_state_tables(self):
+        """
+        Precompute the jump table and the block checks of every
+        packed laser state, see laser_state, as flat lists.
+
+        Returns:
+        tuple of list
+            (jump_stops, jump_bits, check_cells, turned_states):
+            the state of the laser at its next stop, or -1 if it
+            leaves the grid first, the mask of the targets passed
+            on the way,
+            the offset of the cell checked for a block at the point,
+            or -1 if there is none, and the state of the laser once
+            a reflect block turned it.
+        """
+        jump_stops, jump_bits, check_cells, turned_states = [], [], [], []
+        for y in range(self.height):
+            for x in range(self.width):
+                for d, direction in enumerate(DIRECTIONS):
+                    dx, dy = direction
+                    state = ((x, y), direction)
+                    if state in self.jump_table:
+                        stop, passed_targets = self.jump_table[state]
+                    else:
+                        stop, passed_targets = self.next_stop(*state)
+                    jump_stops.append(-1 if stop is None
+                                      else self.laser_state(stop, direction))
+                    jump_bits.append(self.target_mask(passed_targets))
+
+                    # the cell next to the point, in the order
+                    # interact_with_Lasers reads the point
+                    check = -1
+                    for cell in ((x + dx, y), (x, y + dy)):
+                        if (cell[0] % 2 == 1 and cell[1] % 2 == 1
+                                and self.is_inside(cell)):
+                            check = self.offset(cell)
+                            break
+                    check_cells.append(check)
+
+                    # left or right turns x, top or bottom turns y
+                    turned_states.append(4 * self.offset((x, y))
+                                         + (d ^ 2 if x % 2 == 0 else d ^ 1))
+        return jump_stops, jump_bits, check_cells, turned_states
+
 
 def read_bff_file(filename):
     """
@@ -348,140 +721,608 @@ def read_bff_file(filename):
     return grid, lasers, targets, blocks
 
 
-def simulate(grid, Lasers, blocks):
+# Define the SearchStats class.
+class SearchStats:
+
+    def __init__(self):
+        """
+        Initializes a new instance of the SearchStats class.
+
+        Given to a Solver, it counts what the search does. The solver
+        passes it on to trace_path and retrace_path, and simulate and
+        trace_beams take one as their stats argument. When no
+        SearchStats is given, each of them only pays a None check.
+
+        The time of each recursive_solve node runs from its call to
+        the call of the next node, so the time of each depth is the
+        time spent at nodes of that depth, without their subtrees.
+        """
+        self.nodes = 0
+        self.leaves = 0
+        self.traces = 0
+        self.beam_steps = 0
+        self.refract_splits = 0
+        # Number of nodes and seconds spent at each depth
+        self.depth_nodes = []
+        self.depth_seconds = []
+        self.seconds = 0.0
+        self.start_time = None
+        self.last_depth = None
+        self.last_time = None
+
+    def start(self):
+        """ Start the clock of the search. """
+        self.start_time = time.perf_counter()
+
+    def stop(self):
+        """ Stop the clock of the search. """
+        now = time.perf_counter()
+        if self.last_depth is not None:
+            self.depth_seconds[self.last_depth] += now - self.last_time
+            self.last_depth = None
+        self.seconds += now - self.start_time
+
+    def enter_node(self, depth):
+        """
+        Count a recursive_solve or guided_solve node.
+
+        Parameters:
+        depth : int
+            The number of empty positions decided at the node, or
+            the number of blocks placed for guided_solve.
+        """
+        now = time.perf_counter()
+        if self.last_depth is not None:
+            self.depth_seconds[self.last_depth] += now - self.last_time
+        while len(self.depth_nodes) <= depth:
+            self.depth_nodes.append(0)
+            self.depth_seconds.append(0.0)
+        self.depth_nodes[depth] += 1
+        self.nodes += 1
+        self.last_depth = depth
+        self.last_time = now
+
+    def as_dict(self):
+        """
+        Get the counters of the search.
+
+        Returns:
+        dict
+            The counters, the nodes per second and the
+            nodes and seconds of each depth.
+        """
+        return {'nodes': self.nodes,
+                'leaves': self.leaves,
+                'traces': self.traces,
+                'beam_steps': self.beam_steps,
+                'refract_splits': self.refract_splits,
+                'seconds': round(self.seconds, 6),
+                'nodes_per_second': round(self.nodes / self.seconds, 1)
+                if self.seconds > 0 else 0.0,
+                'depth_nodes': self.depth_nodes,
+                'depth_seconds': [round(seconds, 6)
+                                  for seconds in self.depth_seconds]}
+
+    def to_json(self, **fields):
+        """
+        Get the counters as one line of JSON.
+
+        Parameters:
+        **fields
+            Other fields of the line, such as the puzzle file.
+
+        Returns:
+        str
+            The JSON line.
+        """
+        return json.dumps({**fields, **self.as_dict()})
+
+    def summary(self):
+        """
+        Get the counters as text to print.
+
+        Returns:
+        str
+            One line per counter, then one line per depth.
+        """
+        stats = self.as_dict()
+        lines = [f"Nodes expanded: {stats['nodes']}",
+                 f"Leaves checked: {stats['leaves']}",
+                 f"Laser traces: {stats['traces']}",
+                 f"Beam steps: {stats['beam_steps']}",
+                 f"Refract splits: {stats['refract_splits']}",
+                 f"Search time: {stats['seconds']:.3f} s "
+                 f"({stats['nodes_per_second']:.0f} nodes/s)",
+                 f"{'depth':>7}{'nodes':>12}{'time (s)':>12}"]
+        for depth, nodes in enumerate(self.depth_nodes):
+            lines.append(f"{depth:>7}{nodes:>12}"
+                         f"{self.depth_seconds[depth]:>12.4f}")
+        return '\n'.join(lines)
+
+
+def simulate(grid, Lasers, blocks, path=False, targets=None, stats=None):
     """
     This function simulates the laser path
     and finds all the passed target points
 
+    It only reads its arguments, so the same grid and lasers can be
+    simulated from several threads at once.
+
     Parameters:
-        grid: *list*
-            expanded grid
+        grid: *Grid*
+            the grid the lasers travel in
         Lasers: *list*
-            position and direction of all the lasers
+            position and direction of all the lasers,
+            as Laser or LaserSpec
         blocks: *list*
             all the blocks objects
+        path: *bool*
+            whether to also return the path of the lasers
+        targets: *set*
+            if given, the tracing stops as soon as all these
+            targets are hit
+        stats: *SearchStats*
+            counters to update, if not None
 
     Returns:
         hit_targets: *set*
-            all the positions of passed targets
+            all the positions of passed targets, or only those
+            passed before the tracing stopped
+        path_states: *list*
+            only if path is True, the (position, direction) states
+            the beams left a point in, in the order they were traced
 
     """
-    # original state of each Laser
-    original_states = [(laser.position, laser.direction) for laser in Lasers]
+    # the cells of the grid with these blocks instead of its own
+    cells = grid.cells.translate(CLEAR_BLOCKS)
+    for block in blocks:
+        if grid.is_inside(block.position):
+            cells[grid.offset(block.position)] = CELL_CODES[block.block_type]
+
+    # store the laser states already traced, a Laser coming back to
+    # one of them would only repeat a known path
+    visited = bytearray(len(grid.jump_stops))
+
+    required = None if targets is None else grid.target_mask(targets)
+    traced = [] if path else None
+    hit_mask, _ = trace_beams(grid, Lasers, cells, visited, traced, required,
+                              stats)
+    hit_targets = grid.target_set(hit_mask)
+    if not path:
+        return hit_targets
+
+    width = grid.width
+    path_states = [(((state >> 2) % width, (state >> 2) // width),
+                    DIRECTIONS[state & 3]) for state in traced]
+    return hit_targets, path_states
+
+
+def trace_laser(grid, laser, cells=None, visited=None, stats=None):
+    """
+    This function follows one laser and all the beams it splits into
 
-    def reset_Lasers():
-        """ Reset Lasers to their original states. """
-        for i, laser in enumerate(Lasers):
-            orig_pos, orig_dir = original_states[i]
-            laser.position = orig_pos
-            laser.direction = orig_dir
+    Parameters:
+        grid: *Grid*
+            the grid the laser travels in
+        laser: *Laser*
+            position and direction of the laser source
+        cells: *bytearray*
+            the cell codes the laser meets, grid.cells if None
+        visited: *bytearray*
+            one flag per packed laser state already traced,
+            a new one is used if None
+        stats: *SearchStats*
+            counters to update, if not None
 
-    blocks_dict = {block.position: block for block in blocks}
+    Returns:
+        hit_mask: *int*
+            the bits of all the passed targets, see Grid.target_mask
+        touched_mask: *int*
+            the bits of the free positions checked for a block along
+            the path, see Grid.free_index, a block change anywhere
+            else leaves the path unchanged
 
-    # initialize
-    active_Lasers = Lasers.copy()
+    """
+    if cells is None:
+        cells = grid.cells
+    if visited is None:
+        visited = bytearray(len(grid.jump_stops))
+    return trace_beams(grid, [laser], cells, visited, stats=stats)
 
-    # store Laser positions that hit targets
-    hit_targets = set()
 
-    # Initial block interaction check for each Laser at starting position
-    new_Lasers = []
+def trace_path(grid, laser, stats=None):
+    """
+    This function follows one laser on the grid, and keeps where
+    the trace can be resumed once the block of a cell changes
 
-    for laser in active_Lasers:
-        interaction_results = meet_block(laser, blocks_dict)
-        new_Lasers.extend(interaction_results)
+    Parameters:
+        grid: *Grid*
+            the grid the laser travels in, with its blocks
+        laser: *Laser*
+            position and direction of the laser source
+        stats: *SearchStats*
+            counters to update, if not None
 
-    active_Lasers = new_Lasers
+    Returns:
+        path: *BeamPath*
+            the hit_mask and touched_mask of trace_laser, the states
+            the beams left a point in, in the order they were traced,
+            and the checkpoints of the free positions, see trace_beams
 
-    while active_Lasers:
-        new_Lasers = []
+    """
+    states = []
+    checkpoints = {}
+    hit_mask, touched_mask = trace_beams(
+        grid, [laser], grid.cells, bytearray(len(grid.jump_stops)), states,
+        stats=stats, checkpoints=checkpoints)
+    return BeamPath(hit_mask, touched_mask, states, checkpoints)
 
-        for laser in active_Lasers:
-            if laser.active:
-                # Move the Laser
-                laser.move(grid)
 
-                # Check if Laser is within grid bounds
-                if not laser.is_inside(grid):
-                    continue
+def retrace_path(grid, laser, path, cell, stats=None):
+    """
+    This function updates the path of a laser once the block of a
+    free position it checks has changed
 
-                # Block interaction check after moving
-                interaction_results = meet_block(laser, blocks_dict)
-                new_Lasers.extend(interaction_results)
+    Everything traced before the first check of the position is kept,
+    and the trace is resumed from there.
 
-                # Check if Laser hits a target
-                target_cell \
-                    = grid.expanded_grid[laser.position[1]][laser.position[0]]
-                if (laser.position[1] < len(grid.expanded_grid) and
-                        laser.position[0] < len(grid.expanded_grid[0])):
-                    if (target_cell == '?'):
-                        hit_targets.add(laser.position)
+    Parameters:
+        grid: *Grid*
+            the grid the laser travels in, with the changed block
+        laser: *Laser*
+            position and direction of the laser source
+        path: *BeamPath*
+            the path of the laser before the change, from trace_path
+        cell: *int*
+            the offset of the changed position in grid.cells
+        stats: *SearchStats*
+            counters to update, if not None
 
-        active_Lasers = new_Lasers
+    Returns:
+        path: *BeamPath*
+            the path of the laser after the change
 
-    # After simulation, reset Lasers to their original states
-    reset_Lasers()
+    """
+    length, stack, hit_mask, touched_mask = path.checkpoints[cell]
+    states = path.states[:length]
+    visited = bytearray(len(grid.jump_stops))
+    for state in states:
+        visited[state] = 1
+
+    # The positions first checked before this one keep their checkpoints
+    checkpoints = {}
+    for checked, checkpoint in path.checkpoints.items():
+        if checked == cell:
+            break
+        checkpoints[checked] = checkpoint
 
-    return hit_targets
+    hit_mask, touched_mask = trace_beams(
+        grid, [laser], grid.cells, visited, states, stats=stats,
+        checkpoints=checkpoints, start=(list(stack), hit_mask, touched_mask))
+    return BeamPath(hit_mask, touched_mask, states, checkpoints)
 
 
-def meet_block(laser, blocks_dict):
+def trace_beams(grid, Lasers, cells, visited, traced=None, required=None,
+                stats=None, checkpoints=None, start=None):
     """
-    This function checks if the lazor interacts with a block
+    This function follows lasers and all the beams they split into,
+    with each beam packed into an int, see Grid.laser_state
 
     Parameters:
-        laser: *list*
-            2 tuples represent lazor position and direction
+        grid: *Grid*
+            the grid the lasers travel in
+        Lasers: *list*
+            position and direction of the laser sources
+        cells: *bytearray*
+            the cell codes the lasers meet
+        visited: *bytearray*
+            one flag per packed laser state already traced,
+            updated in place
+        traced: *list*
+            the states the beams leave a point in are appended
+            to it, if not None
+        required: *int*
+            mask of the targets to hit, if not None the tracing
+            stops as soon as all of them are hit
+        stats: *SearchStats*
+            counters to update, if not None
+        checkpoints: *dict*
+            if not None, filled with the first check of each free
+            position, keyed by its offset in cells, as a tuple
+            (len(traced), stack, hit_mask, touched_mask) of what the
+            trace had done before the check
+        start: *tuple*
+            a (stack, hit_mask, touched_mask) checkpoint to resume
+            the trace from, instead of starting at the lasers
+
+    Returns:
+        hit_mask: *int*
+            the bits of all the passed targets
+        touched_mask: *int*
+            the bits of the free positions checked for a block
 
+    """
+    jump_stops = grid.jump_stops
+    jump_bits = grid.jump_bits
+    check_cells = grid.check_cells
+    turned_states = grid.turned_states
+    free_bits = grid.free_bits
+
+    hit_mask = 0
+    touched_mask = 0
+
+    # beams arriving at a point, before the block next to it acts
+    stack = []
+    if start is not None:
+        stack, hit_mask, touched_mask = start
+    else:
+        for laser in Lasers:
+            state = grid.laser_state(laser.position, laser.direction)
+            if state < 0:
+                # a laser starting off the grid can only move in
+                stop, passed_targets = grid.next_stop(laser.position,
+                                                      laser.direction)
+                hit_mask |= grid.target_mask(passed_targets)
+                if stop is None:
+                    continue
+                state = grid.laser_state(stop, laser.direction)
+            stack.append(state)
+
+    steps = 0
+    splits = 0
+    while stack:
+        state = stack.pop()
+
+        # Block interaction check at the point
+        cell = check_cells[state]
+        if cell >= 0:
+            bit = free_bits[cell]
+            if checkpoints is not None and bit and not touched_mask & bit:
+                # a block placed here would change the trace from
+                # this point on, the state is checked again then
+                checkpoints[cell] = (len(traced), stack + [state],
+                                     hit_mask, touched_mask)
+            touched_mask |= bit
+            code = cells[cell]
+            if code == OPAQUE:
+                continue
+            if code == REFLECT:
+                state = turned_states[state]
+            elif code == REFRACT:
+                # the turned beam is traced here, the straight one below
+                splits += 1
+                split = turned_states[state]
+                if not visited[split]:
+                    visited[split] = 1
+                    steps += 1
+                    if traced is not None:
+                        traced.append(split)
+                    if jump_bits[split]:
+                        hit_mask |= jump_bits[split]
+                        if (required is not None
+                                and hit_mask & required == required):
+                            break
+                    if jump_stops[split] >= 0:
+                        stack.append(jump_stops[split])
+
+        # Jump the beam straight to the next point
+        # where it may meet a block
+        if visited[state]:
+            continue
+        visited[state] = 1
+        steps += 1
+        if traced is not None:
+            traced.append(state)
+        if jump_bits[state]:
+            hit_mask |= jump_bits[state]
+            # every required target is hit, the rest of the
+            # beams cannot change the answer
+            if required is not None and hit_mask & required == required:
+                break
+        if jump_stops[state] >= 0:
+            stack.append(jump_stops[state])
+
+    if stats is not None:
+        stats.traces += len(Lasers)
+        stats.beam_steps += steps
+        stats.refract_splits += splits
+
+    return hit_mask, touched_mask
+
+
+def trace_reachable(grid, Lasers, blocks_dict, undecided):
+    """
+    This function finds everything the lasers could reach under any
+    choice of blocks for the positions not decided yet
+
+    At an undecided position a laser is both let through and turned,
+    which covers an empty position and every block type, so the
+    result is a superset of the path of any completion.
+
+    Parameters:
+        grid: *Grid*
+            the grid the lasers travel in
+        Lasers: *list*
+            position and direction of all the lasers
         blocks_dict: *dict*
-           number and types of all  blocks
+            block objects keyed by their position,
+            for the positions already decided
+        undecided: *set*
+            the positions whose block is not chosen yet
 
     Returns:
-        new_Lasers: *object*
-            new lazor positions and directions after interaction
+        reachable_targets: *set*
+            all the target points some completion could pass
+        reachable_cells: *set*
+            all the positions some completion could check for a block
+    """
+    reachable_targets = set()
+    reachable_cells = set()
+    visited = set()
+
+    def interact(position, direction):
+        """ All the directions a laser may leave a point with. """
+        x, y = position
+        dx, dy = direction
+        for cell in ((x + dx, y), (x, y + dy)):
+            if cell in undecided:
+                reachable_cells.add(cell)
+                # left or right turns x, top or bottom turns y
+                if x % 2 == 0:
+                    return [direction, (-dx, dy)]
+                return [direction, (dx, -dy)]
+            if cell in blocks_dict:
+                reachable_cells.add(cell)
+                new_direction = blocks_dict[cell].interact_with_Lasers(
+                    position, direction)
+                if new_direction is None:
+                    return []
+                if isinstance(new_direction, list):
+                    return new_direction
+                return [new_direction]
+        return [direction]
+
+    stack = []
+    for laser in Lasers:
+        for direction in interact(laser.position, laser.direction):
+            stack.append((laser.position, direction))
+
+    while stack:
+        state = stack.pop()
+        if state in visited:
+            continue
+        visited.add(state)
+
+        if state in grid.jump_table:
+            stop, passed_targets = grid.jump_table[state]
+        else:
+            stop, passed_targets = grid.next_stop(*state)
+        reachable_targets.update(passed_targets)
+        if stop is None:
+            continue
 
+        for direction in interact(stop, state[1]):
+            stack.append((stop, direction))
+
+    return reachable_targets, reachable_cells
+
+
+def count_bits(mask):
     """
-    x, y = laser.position
-    dx, dy = laser.direction
-    new_Lasers = []
+    This function counts the bits set in a mask
 
-    # Check both adjacent points
-    adjacent_positions = [(x + dx, y), (x, y + dy)]
+    Parameters:
+        mask: *int*
+            a target or placement mask
 
-    for position in adjacent_positions:
+    Returns:
+        count: *int*
+            the number of bits set
+    """
+    return bin(mask).count('1')
 
-        if position in blocks_dict:
 
-            block = blocks_dict[position]
+# Define the orderings of the Solver search.
+class StaticOrdering:
+    """
+    Branch on the empty positions in grid order and try the
+    block types in the order 'A', 'B', 'C', then empty ('o').
 
-            interaction_result = block.interact_with_Lasers(laser.position,
-                                                            laser.direction)
+    An ordering has two methods, select_position and order_values,
+    which recursive_solve calls at each node. Other orderings can be
+    given to the Solver to compare heuristics on the same search.
+    """
 
-            if interaction_result is None:
-                # Return a Laser with no direction change (stopped)
-                return []
+    def select_position(self, solver, index, empty_positions):
+        """
+        Choose the position to branch on next.
 
-            if interaction_result and isinstance(interaction_result, list):
-                # refractive block generates multiple new Lasers
-                for new_direction in interaction_result:
-                    new_Lasers.append(Laser(laser.position, new_direction))
-            else:
-                # reflective block, change the direction
-                new_Lasers.append(Laser(laser.position, interaction_result))
+        Parameters:
+        solver : Solver
+            The solver, with its current laser paths.
+        index : int
+            The number of empty positions with a block chosen.
+        empty_positions : list of tuple
+            The empty positions, the ones decided first.
 
-            # If interaction, do not check other points
-            break
+        Returns:
+        int
+            The index in empty_positions, index or more,
+            of the position to branch on.
+        """
+        return index
 
-    if not new_Lasers:
-        # If no interaction, the Laser continues in the same direction
-        new_Lasers.append(Laser(laser.position, laser.direction))
+    def order_values(self, solver, position, available_blocks):
+        """
+        Order the choices for a position.
 
-    return new_Lasers
+        Parameters:
+        solver : Solver
+            The solver, with its current laser paths.
+        position : tuple of int
+            The (x, y) coordinates of the position.
+        available_blocks : dict
+            The remaining quantities of available block types.
+
+        Returns:
+        str
+            The block types 'A', 'B', 'C' and 'o' in the order to try.
+        """
+        return 'ABCo'
+
+
+class BeamOrdering(StaticOrdering):
+    """
+    Branch first on the most constrained position, the one checked
+    by the most lasers and next to the most targets not hit yet.
+    Its block types are tried by the number of targets the lasers
+    hit once the block is placed, most first.
+    """
+
+    def select_position(self, solver, index, empty_positions):
+        waiting = solver.grid.target_set(solver.target_mask
+                                         & ~solver.hit_mask())
+        free_index = solver.grid.free_index
+
+        best, best_score = index, 0
+        for i in range(index, len(empty_positions)):
+            x, y = empty_positions[i]
+            bit = free_index[(x, y)]
+            score = sum(beam_path.touched_mask >> bit & 1
+                        for beam_path in solver.beam_paths)
+            score += sum(1 for point in ((x - 1, y), (x + 1, y),
+                                         (x, y - 1), (x, y + 1))
+                         if point in waiting)
+            if score > best_score:
+                best, best_score = i, score
+        return best
+
+    def order_values(self, solver, position, available_blocks):
+        # A block no laser reaches does not change the paths
+        if not solver.touched_mask() >> solver.grid.free_index[position] & 1:
+            return 'ABCo'
+
+        scores = {'o': count_bits(solver.hit_mask())}
+        for block_type in 'ABC':
+            if available_blocks[block_type] > 0:
+                solver.push_block(position, block_type)
+                scores[block_type] = count_bits(solver.hit_mask())
+                solver.pop_block(position)
+            else:
+                scores[block_type] = -1
+        return ''.join(sorted('ABCo', key=lambda b: -scores[b]))
+
+
+# Orderings the Solver can be given by name
+ORDERINGS = {'static': StaticOrdering, 'beam': BeamOrdering}
 
 
 # Define the Solver class.
 class Solver:
-    def __init__(self, grid, blocks, lasers, targets):
+    def __init__(self, grid, blocks, lasers, targets, guided=False,
+                 table_size=0, symmetry=False, precheck=False,
+                 ordering='static', stats=None, time_limit=None,
+                 node_limit=None):
         """
         Initializes a new instance of the Solver class.
 
@@ -496,86 +1337,758 @@ class Solver:
         targets : list of tuple
             A list of tuples representing the target points'
             coordinates (x, y) on the grid.
+        guided : boolean
+            Whether to branch only on the empty positions next to the
+            current laser paths, see guided_solve.
+        table_size : int
+            The largest number of failed subtrees remembered by
+            recursive_solve, 0 to turn the transposition table off.
+        symmetry : boolean
+            Whether recursive_solve only explores one placement out of
+            those the symmetries of the board map onto each other.
+            It is not used together with the transposition table,
+            whose keys do not tell which placements were cut.
+        precheck : boolean
+            Whether recursive_solve cuts a subtree as soon as some
+            target cannot be reached whatever blocks go on the
+            positions left.
+        ordering : str or object
+            The order recursive_solve branches in, a name of ORDERINGS
+            or an object with the methods of StaticOrdering. Symmetry
+            reduction is only used with the static ordering, as it
+            compares placements in grid order.
+        stats : SearchStats or None
+            The counters to fill in during the search, None to
+            search without counting.
+        time_limit : float or None
+            The most seconds a search may take, None for no limit.
+        node_limit : int or None
+            The most search nodes a search may expand, None for no
+            limit. Once a limit is reached the search stops, solve
+            returns None and budget_exhausted is set. The placement
+            of all the blocks hitting the most targets so far is kept
+            in best_blocks and best_hits, best_hits staying None if no
+            such placement was reached, and the state of the search
+            in progress.
         """
         self.grid = grid
         self.blocks = blocks
         self.lasers = lasers
         self.targets = targets
-
-    def solve(self):
+        # The bits of the targets, all set once every target is hit
+        self.target_mask = grid.target_mask(targets)
+        self.guided = guided
+        # Event set by another process once the puzzle is solved
+        self.stop_event = None
+        # Node count of the whole search, shared by the worker
+        # processes of process_solve, the part of it this solver has
+        # added and read so far, and the nodes until it adds again
+        self.node_counter = None
+        self.shared_nodes = 0
+        self.shared_total = 0
+        self.share_step = 0
+        # Least recently used table of the subtrees with no solution
+        self.table_size = table_size
+        self.transposition_table = OrderedDict()
+        self.table_hits = 0
+        self.table_misses = 0
+        # Each symmetry of the board as a permutation of the empty
+        # positions, and the rank of the block chosen at each of them
+        self.symmetry = symmetry
+        self.symmetry_maps = []
+        self.orbit_values = []
+        self.precheck = precheck
+        if isinstance(ordering, str):
+            ordering = ORDERINGS[ordering]()
+        self.ordering = ordering
+        # Number of search nodes of the last search
+        self.node_count = 0
+        self.stats = stats
+        # Limits of the search, and what it found before stopping
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.limited = time_limit is not None or node_limit is not None
+        self.deadline = None
+        self.start_time = None
+        self.budget_exhausted = False
+        self.best_blocks = []
+        self.best_hits = None
+        self.progress = None
+        # [branches done, branches] of each recursive_solve
+        # node on the current path, when the search is limited
+        self.search_path = []
+        # Blocks currently on the grid, keyed by position
+        self.blocks_dict = {}
+        # Path of each laser for the current placement, as returned
+        # by trace_path, and the earlier paths to go back to
+        self.beam_paths = []
+        self.beam_path_stack = []
+
+    def solve(self, prefix=()):
         """
         Solve the lazor puzzle and find a valid solution.
 
+        Parameters:
+        prefix : tuple of str
+            Block types ('A', 'B', 'C' or 'o' for empty) already chosen
+            for the first empty positions in grid order, as given
+            by split. The search only explores the rest of the grid.
+
         Returns:
         list of tuple or None
             A list of tuples representing the placed blocks'
             types and positions (block_type, (x, y)).
             Returns None if no valid solution is found.
         """
+        if self.stats is not None:
+            self.stats.start()
+        try:
+            start = self.start_search(prefix, self.symmetry)
+            if start is None:
+                return None
+            empty_positions, placed_blocks, available_blocks, skipped = start
+
+            if self.guided:
+                return self.guided_solve(placed_blocks, available_blocks,
+                                         skipped)
+            # The grid keeps the blocks of the first solution
+            return next(self.recursive_solve(len(prefix), empty_positions,
+                                             placed_blocks, available_blocks),
+                        None)
+        finally:
+            if self.stats is not None:
+                self.stats.stop()
+
+    def solve_all(self, cap=None, copy=True):
+        """
+        Find every solution of the lazor puzzle, one at a time.
+
+        The solutions come from the same recursive_solve search as
+        solve, so every cut it makes applies, and each one is yielded
+        as soon as it is found. The beam-guided search and symmetry
+        reduction are not used, as both skip placements that are
+        solutions too. Once the generator is done or closed, the
+        grid has no block placed.
+
+        Parameters:
+        cap : int or None
+            The most solutions to yield, None for all of them.
+        copy : boolean
+            Whether to yield a copy of each solution. When False,
+            the same list is yielded and changed by the search,
+            which is enough to count the solutions.
+
+        Yields:
+        list of tuple
+            The placed blocks' types and positions (block_type, (x, y))
+            of a solution, which are on the grid until the next one.
+        """
+        if self.stats is not None:
+            self.stats.start()
+
+        start = self.start_search((), False)
+        placed_blocks = start[1]
+        try:
+            if cap is None or cap > 0:
+                found = 0
+                for solution in self.recursive_solve(0, *start[:3]):
+                    yield list(solution) if copy else solution
+                    found += 1
+                    if found == cap:
+                        break
+        finally:
+            # Take off the blocks of the solution the search stopped at
+            for _, position in reversed(placed_blocks):
+                self.pop_block(position)
+            placed_blocks.clear()
+            if self.stats is not None:
+                self.stats.stop()
+
+    def count_solutions(self, cap=None):
+        """
+        Count the solutions of the lazor puzzle, see solve_all.
+
+        Parameters:
+        cap : int or None
+            The count to stop at, None to count all the solutions.
+
+        Returns:
+        int
+            The number of solutions, at most cap.
+        """
+        return sum(1 for _ in self.solve_all(cap, copy=False))
+
+    def start_search(self, prefix, symmetry):
+        """
+        Reset the state of the solver for a new search.
+
+        Parameters:
+        prefix : tuple of str
+            The block types chosen for the first empty positions,
+            see solve.
+        symmetry : boolean
+            Whether to look for the symmetries of the board.
+
+        Returns:
+        tuple or None
+            (empty_positions, placed_blocks, available_blocks,
+            skipped) with the prefix applied, or None if the prefix
+            is not the smallest placement of its orbit.
+        """
+        # Fixed blocks of the grid take part in every simulation
+        self.blocks_dict = {}
+        for y, row in enumerate(self.grid.expanded_grid):
+            for x, value in enumerate(row):
+                if x % 2 == 1 and y % 2 == 1 and value in 'ABC':
+                    self.blocks_dict[(x, y)] = Block(value, (x, y),
+                                                     fixed=True)
+        self.beam_paths = [trace_path(self.grid, laser, stats=self.stats)
+                           for laser in self.lasers]
+        self.beam_path_stack = []
+        self.node_count = 0
+        self.shared_nodes = 0
+        self.shared_total = 0
+        self.share_step = 0
+
+        self.start_time = time.perf_counter()
+        self.deadline = None
+        if self.time_limit is not None:
+            self.deadline = self.start_time + self.time_limit
+        self.budget_exhausted = False
+        self.best_blocks = []
+        self.best_hits = None
+        self.progress = None
+        self.search_path = []
+
         # Generate a list of all empty positions in the grid
         empty_positions = self.grid.get_all_empty_positions()
-        return self.recursive_solve(0, empty_positions, [], self.blocks.copy())
+
+        self.symmetry_maps = []
+        if (symmetry and self.table_size == 0 and not self.guided
+                and type(self.ordering) is StaticOrdering):
+            index_of = {position: i
+                        for i, position in enumerate(empty_positions)}
+            for symmetry in self.grid.find_symmetries(self.lasers):
+                # position i takes the block of position inverse[i]
+                inverse = [0] * len(empty_positions)
+                for i, position in enumerate(empty_positions):
+                    inverse[index_of[self.grid.transform(symmetry,
+                                                         position)]] = i
+                self.symmetry_maps.append(inverse)
+        self.orbit_values = [None] * len(empty_positions)
+        for i, block_type in enumerate(prefix):
+            self.orbit_values[i] = 'ABCo'.index(block_type)
+        if not self.is_orbit_leader(len(prefix)):
+            return None
+
+        # Apply the choices of the prefix
+        placed_blocks = []
+        available_blocks = self.blocks.copy()
+        skipped = set()
+        for position, block_type in zip(empty_positions, prefix):
+            if block_type == 'o':
+                skipped.add(position)
+                continue
+            self.push_block(position, block_type)
+            available_blocks[block_type] -= 1
+            placed_blocks.append((block_type, position))
+        return empty_positions, placed_blocks, available_blocks, skipped
+
+    def is_orbit_leader(self, index):
+        """
+        Check that the blocks chosen so far can still give the
+        smallest placement of its orbit under the board symmetries.
+
+        The placements are compared as sequences of block ranks
+        ('A' < 'B' < 'C' < 'o') over the empty positions. If the
+        image of the current choice by a symmetry is already known to
+        be smaller, that image is explored instead and this branch can
+        be cut.
+
+        Parameters:
+        index : int
+            The number of empty positions with a block chosen.
+
+        Returns:
+        bool
+            False if the branch can be cut.
+        """
+        values = self.orbit_values
+        for inverse in self.symmetry_maps:
+            for i in range(index):
+                other = inverse[i]
+                if other >= index:
+                    break
+                if values[i] != values[other]:
+                    if values[i] > values[other]:
+                        return False
+                    break
+        return True
+
+    def split(self, depth):
+        """
+        Split the search into independent subproblems by choosing
+        the blocks of the first empty positions in every possible way.
+
+        Parameters:
+        depth : int
+            The number of empty positions to choose blocks for.
+
+        Returns:
+        list of tuple of str
+            The prefixes to give to solve, one per subproblem.
+        """
+        prefixes = [()]
+        for _ in self.grid.get_all_empty_positions()[:depth]:
+            prefixes = [prefix + (block_type,) for prefix in prefixes
+                        for block_type in 'ABCo'
+                        if block_type == 'o'
+                        or prefix.count(block_type) < self.blocks[block_type]]
+        return prefixes
+
+    def push_block(self, position, block_type):
+        """
+        Place a block and update the laser paths it can change.
+
+        Only the lasers whose path checked this position are traced
+        again, from the first check of the position on, see
+        retrace_path. The paths of the other lasers are reused as
+        they are.
+
+        Parameters:
+        position : tuple of int
+            The (x, y) coordinates of the block on the expanded grid.
+        block_type : str
+            The type of the block, 'A', 'B' or 'C'.
+        """
+        self.grid.place_block(position, block_type)
+        self.blocks_dict[position] = Block(block_type, position)
+        self.beam_path_stack.append(self.beam_paths)
+        cell = self.grid.offset(position)
+        bit = self.grid.free_bits[cell]
+        self.beam_paths = [
+            retrace_path(self.grid, laser, beam_path, cell, self.stats)
+            if beam_path.touched_mask & bit else beam_path
+            for laser, beam_path in zip(self.lasers, self.beam_paths)]
+
+    def pop_block(self, position):
+        """
+        Remove the block placed last and restore the laser paths
+        from before it was placed.
+
+        Parameters:
+        position : tuple of int
+            The (x, y) coordinates of the block on the expanded grid.
+        """
+        self.grid.remove_block(position)
+        del self.blocks_dict[position]
+        self.beam_paths = self.beam_path_stack.pop()
+
+    def hit_mask(self):
+        """
+        Get the mask of the target points hit by the current placement.
+
+        Returns:
+        int
+            The bits of all the targets hit, see Grid.target_mask.
+        """
+        hit_mask = 0
+        for beam_path in self.beam_paths:
+            hit_mask |= beam_path.hit_mask
+        return hit_mask
+
+    def hit_targets(self):
+        """
+        Get the target points hit by the current placement.
+
+        Returns:
+        set of tuple
+            The coordinates (x, y) of all the targets hit.
+        """
+        return self.grid.target_set(self.hit_mask())
+
+    def subtree_key(self, undecided, available_blocks, reachable_cells):
+        """
+        Get a key that is the same for all the nodes of
+        recursive_solve whose subtrees have the same outcome.
+
+        Blocks on positions that no laser can reach, whatever is
+        placed on the positions left, never change which targets are
+        hit, so only the placements on the reachable positions are
+        part of the key, together with the positions left and
+        the remaining blocks.
+
+        Parameters:
+        undecided : list of tuple
+            The empty positions with no block chosen yet.
+        available_blocks : dict
+            A dictionary containing the remaining
+            quantities of available block types.
+        reachable_cells : set of tuple
+            The positions the lasers could reach, as given by
+            trace_reachable with the positions left undecided.
+
+        Returns:
+        tuple of int
+            The key of the subtree.
+        """
+        free_index = self.grid.free_index
+        undecided_mask = 0
+        for position in undecided:
+            undecided_mask |= 1 << free_index[position]
+        reachable_mask = 0
+        for position in reachable_cells:
+            if position in free_index:
+                reachable_mask |= 1 << free_index[position]
+        placements = self.grid.placement_masks
+        return (undecided_mask, available_blocks['A'], available_blocks['B'],
+                available_blocks['C'], reachable_mask,
+                placements['A'] & reachable_mask,
+                placements['B'] & reachable_mask,
+                placements['C'] & reachable_mask)
+
+    def touched_mask(self):
+        """
+        Get the mask of the free positions checked for a block
+        by the current laser paths.
+
+        Returns:
+        int
+            The bits of the positions checked, see Grid.free_index.
+        """
+        touched_mask = 0
+        for beam_path in self.beam_paths:
+            touched_mask |= beam_path.touched_mask
+        return touched_mask
+
+    def touched_cells(self):
+        """
+        Get the free positions checked for a block by the current
+        laser paths.
+
+        Returns:
+        set of tuple
+            The coordinates (x, y) of all the positions checked.
+        """
+        touched_mask = self.touched_mask()
+        return {position for position, i in self.grid.free_index.items()
+                if touched_mask >> i & 1}
+
+    def search_nodes(self):
+        """
+        Get the number of nodes of the whole search.
+
+        With a node_counter shared by worker processes, the nodes of
+        this solver are added to it at most every 64 nodes, and more
+        often as the node_limit gets close, so that the workers
+        together only go a little over it.
+
+        Returns:
+        int
+            The nodes of this solver, and of the other workers
+            sharing the node_counter.
+        """
+        if self.node_counter is None:
+            return self.node_count
+        if self.node_count - self.shared_nodes >= self.share_step:
+            self.share_nodes()
+        return self.shared_total + self.node_count - self.shared_nodes
+
+    def share_nodes(self):
+        """
+        Add the nodes counted since the last call to the node_counter
+        shared by the worker processes, and read its total.
+        """
+        with self.node_counter.get_lock():
+            self.node_counter.value += self.node_count - self.shared_nodes
+            self.shared_total = self.node_counter.value
+        self.shared_nodes = self.node_count
+        self.share_step = 64
+        if self.node_limit is not None:
+            self.share_step = max(1, min(64, (self.node_limit
+                                              - self.shared_total) // 16))
+
+    def out_of_budget(self, placed_blocks):
+        """
+        Check the limits of the search, and keep the current
+        placement if all the blocks are placed and it hits more
+        targets than the best one so far.
+
+        The clock is only read every 64 nodes, which is cheap next
+        to tracing the lasers.
+
+        Parameters:
+        placed_blocks : list of tuple
+            The placed blocks' types and positions (block_type, (x, y)).
+
+        Returns:
+        bool
+            True once a limit is reached, the search must then stop.
+        """
+        if not self.budget_exhausted:
+            if self.node_limit is not None \
+                    and self.search_nodes() >= self.node_limit:
+                self.budget_exhausted = True
+            elif (self.deadline is not None and self.node_count % 64 == 0
+                  and time.perf_counter() >= self.deadline):
+                self.budget_exhausted = True
+
+            if self.budget_exhausted:
+                # Estimate the explored part of the search tree from
+                # the branches done on the current path
+                explored, weight = 0.0, 1.0
+                for done, branches in self.search_path:
+                    explored += weight * done / branches
+                    weight /= branches
+                self.progress = {
+                    'nodes': self.search_nodes(),
+                    'seconds': time.perf_counter() - self.start_time,
+                    'depth': len(self.search_path),
+                    'explored': explored}
+        if self.budget_exhausted:
+            return True
+
+        # Only complete placements are kept, a partial one would
+        # leave blocks unused
+        if len(placed_blocks) < sum(self.blocks.values()):
+            return False
+        hits = self.hit_mask() & self.target_mask
+        if self.best_hits is None or count_bits(hits) > len(self.best_hits):
+            self.best_hits = self.grid.target_set(hits)
+            self.best_blocks = list(placed_blocks)
+        return False
 
     def recursive_solve(self, index, empty_positions,
-                        placed_blocks, available_blocks):
+                        placed_blocks, available_blocks, reach=None):
         """
         Recursively solve the laser puzzle by
         trying different block placements.
 
+        The solutions are yielded as they are found, with their
+        blocks on the grid, and the search goes on from there when
+        the next one is asked for.
+
         Parameters:
         index : int
             The current index of the empty positions list.
         empty_positions : list of tuple
             A list of tuples representing the coordinates
-            (x, y) of empty positions on the grid.
+            (x, y) of empty positions on the grid. The ordering
+            swaps the position it branches on to the current index,
+            and it is swapped back before returning.
         placed_blocks : list of tuple
             A list of tuples representing the placed blocks'
             types and positions (block_type, (x, y)).
         available_blocks : dict
             A dictionary containing the remaining
             quantities of available block types.
+        reach : tuple or None
+            The (reachable_targets, reachable_cells) trace_reachable
+            gave for the parent node, if it was computed.
 
-        Returns:
-        list of tuple or None
+        Yields:
+        list of tuple
             A list of tuples representing the placed blocks'
-            types and positions (block_type, (x, y)).
-        Returns None if no valid solution is found.
+            types and positions (block_type, (x, y)), for each
+            valid solution found.
         """
-        if index == len(empty_positions):
-            # Check if all types of blocks are exhausted
-            if all(count == 0 for count in available_blocks.values()):
-                # Convert placed_blocks tuples to Block objects
-                block_objects = [Block(block_type, position)
-                                 for block_type, position in placed_blocks]
-                hit_targets = simulate(self.grid, self.lasers, block_objects)
-
-                # Check if all targets are hit
-                if all(target in hit_targets for target in self.targets):
-                    return placed_blocks
-            return None
-
+        # Another process already solved the puzzle
+        if self.stop_event is not None and self.stop_event.is_set():
+            return
+        if self.limited and self.out_of_budget(placed_blocks):
+            return
+        self.node_count += 1
+        if self.stats is not None:
+            self.stats.enter_node(index)
+
+        remaining = sum(available_blocks.values())
+        positions_left = len(empty_positions) - index
+
+        # The remaining blocks no longer fit on the positions left
+        if remaining > positions_left:
+            return
+
+        if remaining == 0:
+            # All the blocks are placed, the positions left stay empty.
+            # The laser paths are kept up to date by push_block
+            if self.stats is not None:
+                self.stats.leaves += 1
+            # Check if all targets are hit
+            if self.hit_mask() & self.target_mask == self.target_mask:
+                yield placed_blocks
+            return
+
+        # What the lasers could reach with any blocks on the positions
+        # left. Deciding a position the lasers of the parent node could
+        # not reach leaves it unchanged, so it is only traced again
+        # when the last decision was on a reachable position.
+        if self.precheck or self.table_size > 0:
+            if reach is None or empty_positions[index - 1] in reach[1]:
+                reach = trace_reachable(self.grid, self.lasers,
+                                        self.blocks_dict,
+                                        set(empty_positions[index:]))
+
+        # Cut the subtree if some target can no longer be hit
+        if self.precheck and not all(target in reach[0]
+                                     for target in self.targets):
+            return
+
+        # Skip subtrees already known to have no solution
+        key = None
+        if self.table_size > 0:
+            key = self.subtree_key(empty_positions[index:],
+                                   available_blocks, reach[1])
+            if key in self.transposition_table:
+                self.transposition_table.move_to_end(key)
+                self.table_hits += 1
+                return
+            self.table_misses += 1
+
+        # Bring the position chosen by the ordering to the current index
+        chosen = self.ordering.select_position(self, index, empty_positions)
+        empty_positions[index], empty_positions[chosen] = \
+            empty_positions[chosen], empty_positions[index]
         current_position = empty_positions[index]
 
-        for block_type in 'ABCo':
-            if block_type == 'o' or available_blocks[block_type] > 0:
+        # Leaving the position empty needs a position left
+        # for each remaining block
+        choices = [block_type for block_type
+                   in self.ordering.order_values(self, current_position,
+                                                 available_blocks)
+                   if (remaining < positions_left if block_type == 'o'
+                       else available_blocks[block_type] > 0)]
+        if self.limited:
+            self.search_path.append([0, len(choices)])
+
+        found = False
+        for block_type in choices:
+            # Only one placement of each symmetry orbit is explored
+            self.orbit_values[index] = 'ABCo'.index(block_type)
+            if self.is_orbit_leader(index + 1):
                 # Place block and update remaining blocks count
                 if block_type != 'o':
-                    self.grid.place_block(current_position, block_type)
+                    self.push_block(current_position, block_type)
                     available_blocks[block_type] -= 1
                     placed_blocks.append((block_type, current_position))
 
                 # Recursively solve for the next position
-                result = self.recursive_solve(index + 1, empty_positions,
-                                              placed_blocks, available_blocks)
-                if result is not None:
-                    return result  # Solution found
+                for solution in self.recursive_solve(index + 1,
+                                                     empty_positions,
+                                                     placed_blocks,
+                                                     available_blocks, reach):
+                    found = True
+                    yield solution  # Solution found
 
                 # Backtrack: Remove block and restore remaining blocks count
                 if block_type != 'o':
-                    self.grid.remove_block(current_position)
+                    self.pop_block(current_position)
                     available_blocks[block_type] += 1
                     placed_blocks.pop()
 
+            if self.limited and not self.budget_exhausted:
+                self.search_path[-1][0] += 1
+
+        if self.limited:
+            self.search_path.pop()
+        empty_positions[index], empty_positions[chosen] = \
+            empty_positions[chosen], empty_positions[index]
+
+        # Remember this subtree has no solution, unless the search
+        # was only stopped by another process or by its limits
+        stopped = self.budget_exhausted or (self.stop_event is not None
+                                            and self.stop_event.is_set())
+        if key is not None and not found and not stopped:
+            self.transposition_table[key] = True
+            if len(self.transposition_table) > self.table_size:
+                self.transposition_table.popitem(last=False)
+
+    def guided_solve(self, placed_blocks, available_blocks, skipped):
+        """
+        Recursively solve the laser puzzle by placing blocks
+        only where the current lasers pass.
+
+        A block that no laser reaches cannot change which targets are
+        hit, so the search only branches on the empty positions next to
+        the current laser paths. Once every target is hit, the blocks
+        left over are put on positions no laser reaches.
+
+        Parameters:
+        placed_blocks : list of tuple
+            A list of tuples representing the placed blocks'
+            types and positions (block_type, (x, y)).
+        available_blocks : dict
+            A dictionary containing the remaining
+            quantities of available block types.
+        skipped : set of tuple
+            Positions already tried by a sibling branch, which stay
+            empty so that each placement is only explored once.
+
+        Returns:
+        list of tuple or None
+            A list of tuples representing the placed blocks'
+            types and positions (block_type, (x, y)).
+        Returns None if no valid solution is found.
+        """
+        # Another process already solved the puzzle
+        if self.stop_event is not None and self.stop_event.is_set():
+            return None
+        if self.limited and self.out_of_budget(placed_blocks):
+            return None
+        self.node_count += 1
+        if self.stats is not None:
+            self.stats.enter_node(len(placed_blocks))
+            if all(count == 0 for count in available_blocks.values()):
+                self.stats.leaves += 1
+
+        touched_cells = self.touched_cells()
+
+        if self.hit_mask() & self.target_mask == self.target_mask:
+            # Fill in the remaining blocks where no laser goes
+            free_positions = [position for position
+                              in self.grid.get_all_empty_positions()
+                              if position not in touched_cells]
+            remaining = [block_type for block_type in 'ABC'
+                         for _ in range(available_blocks[block_type])]
+            if len(remaining) <= len(free_positions):
+                for block_type, position in zip(remaining, free_positions):
+                    self.push_block(position, block_type)
+                    placed_blocks.append((block_type, position))
+                return placed_blocks
+
+        if all(count == 0 for count in available_blocks.values()):
+            return None
+
+        # Empty positions next to the current laser paths, in grid order
+        candidates = sorted((position for position in touched_cells
+                             if position not in skipped
+                             and self.grid.can_place_block(position, 'o')),
+                            key=lambda position: (position[1], position[0]))
+
+        added = []
+        for position in candidates:
+            for block_type in 'ABC':
+                if available_blocks[block_type] > 0:
+                    # Place block and update remaining blocks count
+                    self.push_block(position, block_type)
+                    available_blocks[block_type] -= 1
+                    placed_blocks.append((block_type, position))
+
+                    result = self.guided_solve(placed_blocks,
+                                               available_blocks, skipped)
+                    if result is not None:
+                        return result  # Solution found
+
+                    # Backtrack: Remove block and restore blocks count
+                    self.pop_block(position)
+                    available_blocks[block_type] += 1
+                    placed_blocks.pop()
+
+            # Later branches leave this position empty
+            skipped.add(position)
+            added.append(position)
+
+        for position in added:
+            skipped.discard(position)
         return None
 
 
@@ -584,7 +2097,163 @@ class Solver:
 output_lock = threading.Lock()
 
 
-def solve_puzzle(file_path):
+# Event and node count shared by the worker processes of process_solve
+stop_event = None
+node_counter = None
+
+
+def init_worker(event, counter):
+    """
+    Store the shared objects in a worker process of process_solve.
+
+    Parameters:
+    event : multiprocessing.Event
+        The event set once any worker finds a solution.
+    counter : multiprocessing.Value
+        The number of nodes searched by all the workers.
+    """
+    global stop_event, node_counter
+    stop_event = event
+    node_counter = counter
+
+
+def solve_subproblem(puzzle, prefix, solver_options, deadline=None):
+    """
+    Solve one subproblem of a split search in a worker process.
+
+    Parameters:
+    puzzle : tuple
+        The (grid, lasers, targets, blocks) data from read_bff_file.
+    prefix : tuple of str
+        The block types chosen for the first empty positions.
+    solver_options : dict
+        Keyword arguments of the Solver, such as guided. Its
+        node_limit counts the nodes of all the workers.
+    deadline : float or None
+        The time.time() at which the whole search stops, which
+        replaces the time_limit of the solver options.
+
+    Returns:
+    tuple
+        (key, budget_exhausted, best_key, best_hits, explored): the
+        placement key of a solution, see Grid.placement_key, or None
+        if none was found, whether a limit stopped the search, the
+        key and the targets hit of the best complete placement found
+        when the search is limited, both None if there is none, and
+        the part of the subproblem explored.
+    """
+    grid_data, lasers, targets, blocks = puzzle
+    if deadline is not None:
+        solver_options = dict(solver_options,
+                              time_limit=max(0.0, deadline - time.time()))
+    solver = Solver(Grid(grid_data, targets), blocks, lasers, targets,
+                    **solver_options)
+    solver.stop_event = stop_event
+    solver.node_counter = node_counter
+    solution = solver.solve(prefix)
+    if node_counter is not None and solver.node_count:
+        solver.share_nodes()
+
+    if solution is not None:
+        # The solution is left on the grid, its masks are all the
+        # parent process needs
+        return solver.grid.placement_key(), False, None, None, 1.0
+    best_key = None
+    if solver.best_hits is not None:
+        best_key = solver.grid.placement_key(solver.best_blocks)
+    if solver.budget_exhausted:
+        return (None, True, best_key, solver.best_hits,
+                solver.progress['explored'])
+    stopped = stop_event is not None and stop_event.is_set()
+    return (None, False, best_key, solver.best_hits,
+            0.0 if stopped else 1.0)
+
+
+def process_solve(puzzle, workers, split_depth=None, **solver_options):
+    """
+    Solve a laser puzzle on several processes at once.
+
+    The search tree is split at split_depth into independent
+    subproblems, which are shared out to a process pool. As soon
+    as one worker finds a solution, the others are told to stop.
+    The time_limit and the node_limit of the solver options bound
+    the whole search: the workers share one deadline and one node
+    count.
+
+    Parameters:
+    puzzle : tuple
+        The (grid, lasers, targets, blocks) data from read_bff_file.
+    workers : int
+        The number of worker processes.
+    split_depth : int or None
+        The number of empty positions chosen before splitting.
+        If None, the smallest depth giving at least eight
+        subproblems per worker is used.
+    **solver_options
+        Keyword arguments of the Solver of each worker, such as guided.
+
+    Returns:
+    tuple
+        (solution, progress, best_blocks, best_hits): the placed
+        blocks (block_type, (x, y)) of a solution, or None if no
+        valid solution is found. If a limit stopped the search
+        first, progress holds its 'nodes', 'seconds' and 'explored'
+        part, and best_blocks and best_hits the complete placement
+        that hit the most targets, as for a Solver, otherwise
+        progress is None.
+    """
+    grid_data, lasers, targets, blocks = puzzle
+    solver = Solver(Grid(grid_data, targets), blocks, lasers, targets)
+
+    if split_depth is None:
+        split_depth = 0
+        empty_count = len(solver.grid.get_all_empty_positions())
+        while (split_depth < empty_count
+               and len(solver.split(split_depth)) < 8 * workers):
+            split_depth += 1
+    prefixes = solver.split(split_depth)
+
+    start_time = time.time()
+    deadline = None
+    if solver_options.get('time_limit') is not None:
+        deadline = start_time + solver_options['time_limit']
+
+    event = multiprocessing.Event()
+    counter = multiprocessing.Value('q', 0)
+    exhausted = False
+    explored = 0.0
+    best_key, best_hits = None, None
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(event, counter)) as executor:
+        futures = [executor.submit(solve_subproblem, puzzle, prefix,
+                                   solver_options, deadline)
+                   for prefix in prefixes]
+        for future in as_completed(futures):
+            key, budget_exhausted, key_best, hits, part = future.result()
+            if key is not None:
+                # Stop the running workers and drop the queued ones
+                event.set()
+                for other in futures:
+                    other.cancel()
+                return solver.grid.placements(key), None, [], None
+            exhausted = exhausted or budget_exhausted
+            explored += part
+            if hits is not None and (best_hits is None
+                                     or len(hits) > len(best_hits)):
+                best_key, best_hits = key_best, hits
+
+    if not exhausted:
+        return None, None, [], None
+    progress = {'nodes': counter.value,
+                'seconds': time.time() - start_time,
+                'explored': explored / len(prefixes)}
+    best_blocks = [] if best_key is None \
+        else solver.grid.placements(best_key)
+    return None, progress, best_blocks, best_hits
+
+
+def solve_puzzle(file_path, workers=1, engine='search', stats_format=None,
+                 **solver_options):
     """
     Solve a laser puzzle from a given BFF file and
     print the solution or a failure message.
@@ -592,6 +2261,18 @@ def solve_puzzle(file_path):
     Parameters:
     file_path : str
         The path to the BFF file containing the lazor puzzle data.
+    workers : int
+        The number of processes to search with, see process_solve.
+    engine : str
+        'search' for the backtracking Solver, or 'sat' for the
+        ConstraintSolver of constraint_solver.py.
+    stats_format : str or None
+        'text' to print a summary of the search counters, 'json' to
+        print them as one JSON line, or None not to count. Only the
+        single-process search is counted, the command line refuses
+        --stats with --workers, --engine sat or --count.
+    **solver_options
+        Keyword arguments of the Solver, such as guided or table_size.
 
     Returns:
     None
@@ -604,55 +2285,219 @@ def solve_puzzle(file_path):
     print("The initial grid: ")
     for row in grid.expanded_grid:
         print(''.join(row))
-    solver = Solver(grid, blocks, lasers, targets)
-
-    # Create a solver object
-    solver = Solver(grid, blocks, lasers, targets)
 
-    # Attempt to solve the puzzle
-    solution = solver.solve()
+    # State of the search and best placement, if it ran out of budget
+    progress = None
+    best_blocks, best_hits = [], None
+
+    if engine == 'sat':
+        # Imported here, as it is only needed by this engine
+        from constraint_solver import ConstraintSolver
+
+        solver = ConstraintSolver(grid, blocks, lasers, targets)
+        solution = solver.solve()
+        print(f"Constraint solver: {solver.iterations} models checked "
+              f"with the {solver.backend} backend")
+    elif workers > 1:
+        # Attempt to solve the puzzle on several processes
+        solution, progress, best_blocks, best_hits = process_solve(
+            (grid_data, lasers, targets, blocks), workers, **solver_options)
+        # Show the blocks found by the workers on this grid
+        for block_type, position in solution or []:
+            grid.place_block(position, block_type)
+    else:
+        # Create a solver object
+        stats = SearchStats() if stats_format else None
+        solver = Solver(grid, blocks, lasers, targets, stats=stats,
+                        **solver_options)
+
+        # Attempt to solve the puzzle
+        solution = solver.solve()
+        if stats_format == 'json':
+            print(stats.to_json(file=file_path, solved=solution is not None))
+        elif stats_format == 'text':
+            print(stats.summary())
+        if solver.table_size > 0:
+            print(f"Transposition table: {solver.table_hits} hits, "
+                  f"{solver.table_misses} misses, "
+                  f"{len(solver.transposition_table)} entries kept")
+        if solver.budget_exhausted:
+            progress = solver.progress
+            best_blocks, best_hits = solver.best_blocks, solver.best_hits
+
+    if progress is not None:
+        print(f"Search stopped after {progress['nodes']} nodes and "
+              f"{progress['seconds']:.2f} s, about "
+              f"{progress['explored']:.1%} of the search explored")
+        # Show the best placement found on this grid
+        for block_type, position in best_blocks:
+            grid.place_block(position, block_type)
 
     # Use a lock to synchronize printing the solution or failure message
     with output_lock:
-        solution_output = ""
-        if solution:
-            solution_output += f"Solution found for {file_path}:\n"
-            for row in grid.expanded_grid:
-                solution_output += ''.join(row) + "\n"
-        else:
-            solution_output += f"No solution found for {file_path}.\n"
+        solution_output = format_solution(file_path, grid, solution,
+                                          best_hits, progress is not None)
 
         # Print the solution or failure message
         print(solution_output)
 
-        # Extract the base file name without extension and path
-        base_file_name = os.path.splitext(os.path.basename(file_path))[0]
+        # Write the solution or failure message to a text file
+        save_solution(file_path, solution_output)
 
-        # Construct the output file name
-        output_file_name = base_file_name + '_solution.txt'
 
-        # Write the solution or failure message to a text file
-        with open(output_file_name, 'w') as file:
-            file.write(solution_output)
+def format_solution(file_path, grid, solution, best_hits=None,
+                    stopped=False):
+    """
+    Build the solution or failure message of a puzzle.
+
+    Parameters:
+    file_path : str
+        The path to the BFF file containing the lazor puzzle data.
+    grid : Grid
+        The grid with the blocks of the solution placed, or of the
+        best placement if the search ran out of time.
+    solution : list of tuple or None
+        The placed blocks returned by the solver.
+    best_hits : set of tuple or None
+        The targets hit by the best placement of all the blocks, if
+        the search stopped at its limits after reaching one.
+    stopped : boolean
+        Whether the search stopped at its limits.
+
+    Returns:
+    str
+        The message to print and save.
+    """
+    solution_output = ""
+    if solution:
+        solution_output += f"Solution found for {file_path}:\n"
+        for row in grid.expanded_grid:
+            solution_output += ''.join(row) + "\n"
+    elif best_hits is not None:
+        solution_output += (f"No solution found for {file_path} within the "
+                            f"limits. The best placement hits "
+                            f"{len(best_hits)} of {len(grid.targets)} "
+                            f"targets:\n")
+        for row in grid.expanded_grid:
+            solution_output += ''.join(row) + "\n"
+    elif stopped:
+        solution_output += (f"No solution found for {file_path} within the "
+                            f"limits, before any placement of all the "
+                            f"blocks was reached.\n")
+    else:
+        solution_output += f"No solution found for {file_path}.\n"
+    return solution_output
+
+
+def save_solution(file_path, solution_output, output_dir='.'):
+    """
+    Write the solution or failure message of a puzzle
+    to '<puzzle name>_solution.txt'.
+
+    Parameters:
+    file_path : str
+        The path to the BFF file containing the lazor puzzle data.
+    solution_output : str
+        The message built by format_solution.
+    output_dir : str
+        The directory to write the text file to.
+
+    Returns:
+    str
+        The path of the text file written.
+    """
+    # Extract the base file name without extension and path
+    base_file_name = os.path.splitext(os.path.basename(file_path))[0]
+
+    # Construct the output file name
+    output_file_name = os.path.join(output_dir,
+                                    base_file_name + '_solution.txt')
+
+    with open(output_file_name, 'w') as file:
+        file.write(solution_output)
+    return output_file_name
 
 
-def parallel_solve(bff_file):
+def parallel_solve(bff_file, workers=1, engine='search', **solver_options):
     """
     Solve a laser puzzle from a BFF file in a separate thread.
 
     Parameters:
     bff_file : str
         The path to the BFF file containing the lazor puzzle data.
+    workers : int
+        The number of processes to search with, see process_solve.
+    engine : str
+        The engine to solve with, see solve_puzzle.
+    **solver_options
+        Keyword arguments of the Solver, such as guided or table_size.
 
     Returns:
     None
     """
     # Create a new thread to solve the puzzle in parallel
-    thread = threading.Thread(target=solve_puzzle, args=(bff_file,))
+    thread = threading.Thread(target=solve_puzzle,
+                              args=(bff_file, workers, engine),
+                              kwargs=solver_options)
     thread.start()
     thread.join()
 
 
 if __name__ == "__main__":
-    bff_file = "./Lazor data/tiny_5.bff"  # replace with your .bff file name
-    parallel_solve(bff_file)
+    parser = argparse.ArgumentParser(description="Solve a lazor puzzle.")
+    parser.add_argument("bff_file", nargs="?",
+                        default="./Lazor data/tiny_5.bff",
+                        help="the .bff file to solve")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes to search with")
+    parser.add_argument("--guided", action="store_true",
+                        help="only place blocks where the lasers pass")
+    parser.add_argument("--table-size", type=int, default=0,
+                        help="number of failed subtrees to remember, "
+                             "0 to turn the transposition table off")
+    parser.add_argument("--symmetry", action="store_true",
+                        help="skip placements that are mirror images "
+                             "or rotations of one already explored")
+    parser.add_argument("--precheck", action="store_true",
+                        help="cut subtrees where a target can no longer "
+                             "be reached")
+    parser.add_argument("--engine", choices=["search", "sat"],
+                        default="search",
+                        help="backtracking search, or a SAT encoding "
+                             "solved by PySAT if installed or a built-in "
+                             "CDCL solver")
+    parser.add_argument("--ordering", choices=sorted(ORDERINGS),
+                        default="static",
+                        help="order of the positions and block types "
+                             "the search branches on")
+    parser.add_argument("--stats", choices=["text", "json"], default=None,
+                        help="print the search counters as a summary "
+                             "or as a JSON line")
+    parser.add_argument("--time-limit", type=float, default=None,
+                        help="stop the search after this many seconds")
+    parser.add_argument("--node-limit", type=int, default=None,
+                        help="stop the search after this many nodes")
+    parser.add_argument("--count", action="store_true",
+                        help="count the solutions instead of solving")
+    parser.add_argument("--cap", type=int, default=None,
+                        help="stop counting at this many solutions")
+    args = parser.parse_args()
+    if args.stats and (args.workers > 1 or args.engine == 'sat'
+                       or args.count):
+        # The counters live in the Solver of a single-process search
+        parser.error("--stats only counts the single-process search, "
+                     "not --workers N, --engine sat or --count")
+    if args.count:
+        grid_data, lasers, targets, blocks = read_bff_file(args.bff_file)
+        solver = Solver(Grid(grid_data, targets), blocks, lasers, targets,
+                        table_size=args.table_size, precheck=args.precheck,
+                        ordering=args.ordering)
+        count = solver.count_solutions(args.cap)
+        print(f"{args.bff_file}: {count} solution{'s' * (count != 1)}")
+    else:
+        parallel_solve(args.bff_file, args.workers, args.engine,
+                       stats_format=args.stats, guided=args.guided,
+                       table_size=args.table_size,
+                       symmetry=args.symmetry, precheck=args.precheck,
+                       ordering=args.ordering, time_limit=args.time_limit,
+                       node_limit=args.node_limit)
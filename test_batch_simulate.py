@@ -0,0 +1,71 @@
+import itertools
+import os
+import random
+
+import pytest
+
+import main_version1
+from test_simulate import LOOP_BOARDS, edge_points
+
+np = pytest.importorskip('numpy')
+
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Lazor data')
+
+
+def candidate_grids(grid, blocks, rng, count):
+    """
+    The first grids of generate_possible_grids, and grids with the
+    blocks at random free positions in a random order.
+    """
+    grids = list(itertools.islice(
+        main_version1.generate_possible_grids(grid, blocks), count))
+    free = [(x, y) for y, row in enumerate(grid)
+            for x, value in enumerate(row) if value == 'o']
+    block_types = [b for b in sorted(blocks) for _ in range(blocks[b])]
+    for _ in range(count):
+        new_grid = [row[:] for row in grid]
+        for (x, y), block_type in zip(rng.sample(free, len(block_types)),
+                                      rng.sample(block_types,
+                                                 len(block_types))):
+            new_grid[y][x] = block_type
+        grids.append(new_grid)
+    return grids
+
+
+def simulate_grid(grid, lazors, targets):
+    """ The hits of one grid, the way solve_all checks it. """
+    expanded_grid = main_version1.expand_grid(grid, targets)
+    blocks = [main_version1.Block(value, (x, y))
+              for y, row in enumerate(expanded_grid)
+              for x, value in enumerate(row) if value in 'ABC']
+    return main_version1.simulate(expanded_grid, lazors, blocks)
+
+
+# dark_1, numbered_6 and showstopper_4 have B blocks,
+# mad_1 and tiny_5 have C blocks
+@pytest.mark.parametrize('name', ['dark_1', 'mad_1', 'mad_7', 'numbered_6',
+                                  'showstopper_4', 'tiny_5', 'yarn_5'])
+def test_batch_simulate_matches_simulate(name):
+    grid, lazors, targets, blocks = main_version1.read_bff_file(
+        os.path.join(DATA, name + '.bff'))
+    grids = candidate_grids(grid, blocks, random.Random(name), 200)
+
+    hits = main_version1.batch_simulate(grids, lazors, targets)
+    assert hits.shape == (len(grids), len(targets))
+    target_list = sorted(targets)
+    for k, candidate in enumerate(grids):
+        passed = simulate_grid(candidate, lazors, targets)
+        assert [target in passed for target in target_list] == \
+            hits[k].tolist()
+
+
+@pytest.mark.parametrize('name', sorted(LOOP_BOARDS))
+def test_batch_simulate_loop_terminates(name):
+    raw_grid, lasers, expected = LOOP_BOARDS[name]
+    targets = edge_points(raw_grid)
+    lazors = [main_version1.Lazor(position, direction)
+              for position, direction in lasers]
+    hits = main_version1.batch_simulate([raw_grid], lazors, targets)
+    assert {target for target, hit in zip(sorted(targets), hits[0])
+            if hit} == expected
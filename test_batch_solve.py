@@ -0,0 +1,40 @@
+import os
+import shutil
+
+import batch_solve
+
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Lazor data')
+
+
+def copy_board(name, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    shutil.copy(os.path.join(DATA, name + '.bff'), path)
+
+
+def test_unique_names_share_the_output_dir(tmp_path):
+    copy_board('dark_1', str(tmp_path / 'easy' / 'dark_1.bff'))
+    copy_board('tiny_5', str(tmp_path / 'hard' / 'tiny_5.bff'))
+    file_paths = batch_solve.find_bff_files([str(tmp_path / '*' / '*.bff')])
+    assert set(batch_solve.solution_dirs(file_paths, 'out').values()) == \
+        {'out'}
+
+
+def test_same_names_do_not_overwrite(tmp_path):
+    # Two different puzzles, both named level_1.bff
+    easy = str(tmp_path / 'levels' / 'easy' / 'level_1.bff')
+    hard = str(tmp_path / 'levels' / 'hard' / 'level_1.bff')
+    copy_board('dark_1', easy)
+    copy_board('tiny_5', hard)
+    output_dir = str(tmp_path / 'out')
+
+    rows = batch_solve.batch_solve([str(tmp_path / 'levels' / '*' / '*.bff')],
+                                   workers=1, output_dir=output_dir)
+    assert sorted(row['status'] for row in rows) == ['solved', 'solved']
+
+    for path, name in [(easy, 'easy'), (hard, 'hard')]:
+        with open(os.path.join(output_dir, name,
+                               'level_1_solution.txt')) as file:
+            assert path in file.read()
+    assert not os.path.exists(os.path.join(output_dir,
+                                           'level_1_solution.txt'))
@@ -0,0 +1,113 @@
+import itertools
+import os
+import random
+
+import pytest
+
+import main_version2
+from constraint_solver import CDCL, ConstraintSolver
+from test_solve_all import DATA, PUZZLES, SOLUTIONS
+
+
+def random_clauses(rng, num_vars, num_clauses):
+    """ Random 3-literal clauses over the variables 1..num_vars. """
+    return [[var if rng.random() < 0.5 else -var
+             for var in rng.sample(range(1, num_vars + 1), 3)]
+            for _ in range(num_clauses)]
+
+
+def satisfies(model, clauses):
+    return all(any(model[abs(lit)] == (lit > 0) for lit in clause)
+               for clause in clauses)
+
+
+def brute_force_models(num_vars, clauses):
+    """ Every assignment of the variables satisfying the clauses. """
+    models = []
+    for values in itertools.product((False, True), repeat=num_vars):
+        model = [False] + list(values)
+        if satisfies(model, clauses):
+            models.append(tuple(model))
+    return models
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_cdcl_matches_brute_force(seed):
+    # Around 4.3 clauses per variable, so that some of the formulas
+    # are satisfiable and some are not
+    rng = random.Random(seed)
+    num_vars = 8
+    clauses = random_clauses(rng, num_vars, 34)
+    sat = CDCL()
+    for _ in range(num_vars):
+        sat.new_var()
+    for clause in clauses:
+        sat.add_clause(clause)
+
+    # Rule out each model found, as ConstraintSolver does, until
+    # there is none left
+    found = set()
+    while True:
+        model = sat.solve()
+        if model is None:
+            break
+        assert satisfies(model, clauses)
+        assert tuple(model) not in found
+        found.add(tuple(model))
+        sat.add_clause([-var if model[var] else var
+                        for var in range(1, num_vars + 1)])
+    assert found == set(brute_force_models(num_vars, clauses))
+
+
+def check_placement(puzzle, solution):
+    """ The solution uses the inventory and hits every target. """
+    grid_data, lasers, targets, blocks = puzzle
+    assert sorted(block_type for block_type, _ in solution) == \
+        sorted(b for b in 'ABC' for _ in range(blocks[b]))
+    fixed = [main_version2.Block(value, (2 * x + 1, 2 * y + 1))
+             for y, row in enumerate(grid_data)
+             for x, value in enumerate(row) if value in 'ABC']
+    hits = main_version2.simulate(
+        main_version2.Grid(grid_data, targets), lasers,
+        fixed + [main_version2.Block(block_type, position)
+                 for block_type, position in solution])
+    assert all(target in hits for target in targets)
+
+
+@pytest.mark.parametrize('name', sorted(PUZZLES))
+def test_cdcl_backend_matches_brute_force(name):
+    puzzle = PUZZLES[name]
+    grid_data, lasers, targets, blocks = puzzle
+    solver = ConstraintSolver(main_version2.Grid(grid_data, targets),
+                              dict(blocks), lasers, targets, backend='cdcl')
+    solution = solver.solve()
+    assert (solution is not None) == bool(SOLUTIONS[name])
+    if solution is not None:
+        check_placement(puzzle, solution)
+        assert frozenset(solution) in SOLUTIONS[name]
+
+
+@pytest.mark.parametrize('name', sorted(
+    os.path.splitext(file_name)[0] for file_name in os.listdir(DATA)
+    if file_name.endswith('.bff')))
+def test_cdcl_backend_solves_boards(name):
+    puzzle = main_version2.read_bff_file(os.path.join(DATA, name + '.bff'))
+    grid_data, lasers, targets, blocks = puzzle
+    solver = ConstraintSolver(main_version2.Grid(grid_data, targets),
+                              dict(blocks), lasers, targets, backend='cdcl')
+    solution = solver.solve()
+    assert solution is not None
+    check_placement(puzzle, solution)
+
+
+@pytest.mark.parametrize('name', sorted(PUZZLES))
+def test_pysat_backend_matches_brute_force(name):
+    pytest.importorskip('pysat')
+    puzzle = PUZZLES[name]
+    grid_data, lasers, targets, blocks = puzzle
+    solver = ConstraintSolver(main_version2.Grid(grid_data, targets),
+                              dict(blocks), lasers, targets, backend='pysat')
+    solution = solver.solve()
+    assert (solution is not None) == bool(SOLUTIONS[name])
+    if solution is not None:
+        check_placement(puzzle, solution)
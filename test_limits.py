@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+import main_version2
+
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Lazor data')
+
+
+def read_board(name):
+    return main_version2.read_bff_file(os.path.join(DATA, name + '.bff'))
+
+
+def check_best(puzzle, best_blocks, best_hits):
+    """ The best placement uses every block and misses a target. """
+    grid_data, lasers, targets, blocks = puzzle
+    if best_hits is None:
+        assert best_blocks == []
+        return
+    assert len(best_blocks) == sum(blocks.values())
+    assert sorted(block_type for block_type, _ in best_blocks) == \
+        sorted(b for b in 'ABC' for _ in range(blocks[b]))
+    assert len(best_hits) < len(targets)
+
+    grid = main_version2.Grid(grid_data, targets)
+    fixed = [main_version2.Block(value, (2 * x + 1, 2 * y + 1))
+             for y, row in enumerate(grid_data)
+             for x, value in enumerate(row) if value in 'ABC']
+    hits = main_version2.simulate(
+        grid, lasers, fixed + [main_version2.Block(block_type, position)
+                               for block_type, position in best_blocks])
+    assert best_hits == {target for target in targets if target in hits}
+
+
+@pytest.mark.parametrize('node_limit', [2, 20, 50, 200])
+@pytest.mark.parametrize('name', ['dark_1', 'tiny_5', 'mad_1'])
+def test_best_placement_is_complete(name, node_limit):
+    puzzle = read_board(name)
+    grid_data, lasers, targets, blocks = puzzle
+    solver = main_version2.Solver(main_version2.Grid(grid_data, targets),
+                                  blocks, lasers, targets,
+                                  node_limit=node_limit)
+    if solver.solve() is None:
+        assert solver.budget_exhausted
+        check_best(puzzle, solver.best_blocks, solver.best_hits)
+
+
+def test_dark_1_stopped_before_a_complete_placement():
+    # The first nodes place some of the blocks only
+    puzzle = read_board('dark_1')
+    grid_data, lasers, targets, blocks = puzzle
+    solver = main_version2.Solver(main_version2.Grid(grid_data, targets),
+                                  blocks, lasers, targets, node_limit=2)
+    assert solver.solve() is None
+    assert solver.best_hits is None
+    message = main_version2.format_solution(
+        'dark_1.bff', solver.grid, None, solver.best_hits, True)
+    assert 'before any placement of all the blocks' in message
+
+
+def test_process_solve_best_placement_is_complete():
+    puzzle = read_board('dark_1')
+    solution, progress, best_blocks, best_hits = \
+        main_version2.process_solve(puzzle, 2, node_limit=50)
+    if solution is None:
+        assert progress is not None
+        check_best(puzzle, best_blocks, best_hits)
@@ -0,0 +1,101 @@
+import os
+import random
+import threading
+
+import pytest
+
+import main_version1
+import main_version2
+
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Lazor data')
+
+# Boards where a beam comes back to a state it already left, each
+# with its lasers and the points the lasers pass
+LOOP_BOARDS = {
+    # The laser starts inside a diamond of reflect blocks around the
+    # middle cell and goes round it forever
+    'reflect_loop': (
+        [['A', 'A', 'o'],
+         ['A', 'o', 'A'],
+         ['A', 'A', 'o']],
+        [((4, 3), (-1, 1))],
+        {(2, 3), (3, 2), (3, 4), (4, 3)}),
+    # The refract block sends a beam round the reflect blocks and
+    # back into itself, without it the path has no loop
+    'refract_loop': (
+        [['o', 'A', 'A'],
+         ['o', 'o', 'A'],
+         ['C', 'o', 'o']],
+        [((2, 5), (-1, -1))],
+        {(0, 3), (0, 5), (1, 4), (2, 3), (3, 2), (3, 4), (4, 3)}),
+}
+
+
+def edge_points(raw_grid):
+    """ Every point a laser can pass, all used as targets. """
+    return {(x, y) for y in range(2 * len(raw_grid) + 1)
+            for x in range(2 * len(raw_grid[0]) + 1) if (x + y) % 2 == 1}
+
+
+def run_with_timeout(function, *args, timeout=5):
+    """ Call a function, failing the test if it does not return. """
+    result = []
+    thread = threading.Thread(target=lambda: result.append(function(*args)),
+                              daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "simulate() did not terminate"
+    return result[0]
+
+
+@pytest.mark.parametrize('name', sorted(LOOP_BOARDS))
+def test_version1_loop_terminates(name):
+    raw_grid, lasers, expected = LOOP_BOARDS[name]
+    targets = edge_points(raw_grid)
+    expanded_grid = main_version1.expand_grid(raw_grid, targets)
+    blocks = [main_version1.Block(value, (x, y))
+              for y, row in enumerate(expanded_grid)
+              for x, value in enumerate(row) if value in 'ABC']
+    lazors = [main_version1.Lazor(position, direction)
+              for position, direction in lasers]
+
+    hits = run_with_timeout(main_version1.simulate, expanded_grid, lazors,
+                            blocks)
+    assert hits == expected
+
+
+@pytest.mark.parametrize('name', sorted(LOOP_BOARDS))
+def test_version2_loop_terminates(name):
+    raw_grid, lasers, expected = LOOP_BOARDS[name]
+    grid = main_version2.Grid(raw_grid, sorted(edge_points(raw_grid)))
+    blocks = [main_version2.Block(value, (2 * x + 1, 2 * y + 1))
+              for y, row in enumerate(raw_grid)
+              for x, value in enumerate(row) if value in 'ABC']
+    specs = [main_version2.LaserSpec(position, direction)
+             for position, direction in lasers]
+
+    hits = run_with_timeout(main_version2.simulate, grid, specs, blocks)
+    assert hits == expected
+
+
+@pytest.mark.parametrize('name', ['mad_7', 'numbered_6', 'yarn_5'])
+def test_retrace_path_matches_trace_path(name):
+    grid_data, lasers, targets, _ = main_version2.read_bff_file(
+        os.path.join(DATA, name + '.bff'))
+    grid = main_version2.Grid(grid_data, targets)
+    paths = [main_version2.trace_path(grid, laser) for laser in lasers]
+    rng = random.Random(name)
+    for _ in range(500):
+        # Place a block on an empty position or remove a placed one
+        position = rng.choice(grid.free_positions)
+        cell = grid.offset(position)
+        if grid.cells[cell] == main_version2.OPEN:
+            grid.place_block(position, rng.choice('ABC'))
+        else:
+            grid.remove_block(position)
+        paths = [main_version2.retrace_path(grid, laser, path, cell)
+                 if path.touched_mask & grid.free_bits[cell] else path
+                 for laser, path in zip(lasers, paths)]
+        for laser, path in zip(lasers, paths):
+            assert path == main_version2.trace_path(grid, laser)
@@ -0,0 +1,91 @@
+import itertools
+import os
+
+import pytest
+
+import main_version2
+from generate_board import generate_board
+
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Lazor data')
+
+# Solver options whose cuts must not lose any solution
+OPTIONS = {
+    'plain': {},
+    'precheck': {'precheck': True},
+    'beam': {'ordering': 'beam', 'precheck': True},
+    'table': {'table_size': 500},
+}
+
+
+def small_puzzles():
+    """ Small boards, read or generated, as read_bff_file gives them. """
+    grid, lasers, targets, blocks = main_version2.read_bff_file(
+        os.path.join(DATA, 'tiny_5.bff'))
+    puzzles = {'tiny_5': (grid, lasers, targets, blocks),
+               # without its refract block tiny_5 has no solution
+               'tiny_5_no_c': (grid, lasers, targets,
+                               dict(blocks, C=0))}
+    for seed in range(6):
+        puzzle = generate_board(3, 3 + seed % 2, {'A': 2, 'B': seed % 2,
+                                                  'C': 1},
+                                {'A': seed % 2}, lasers=1 + seed % 2,
+                                targets=3, seed=seed)
+        lasers = [main_version2.Laser(position, direction)
+                  for position, direction in puzzle['lasers']]
+        puzzles[f'generated_{seed}'] = (puzzle['grid'], lasers,
+                                        puzzle['targets'], puzzle['blocks'])
+    return puzzles
+
+
+PUZZLES = small_puzzles()
+
+
+def brute_force(puzzle):
+    """ Every placement of the blocks that hits all the targets. """
+    grid_data, lasers, targets, blocks = puzzle
+    grid = main_version2.Grid(grid_data, targets)
+    fixed = [main_version2.Block(value, (2 * x + 1, 2 * y + 1))
+             for y, row in enumerate(grid_data)
+             for x, value in enumerate(row) if value in 'ABC']
+    block_types = [b for b in 'ABC' for _ in range(blocks[b])]
+
+    solutions = set()
+    for positions in itertools.combinations(grid.free_positions,
+                                            len(block_types)):
+        for order in set(itertools.permutations(block_types)):
+            placement = frozenset(zip(order, positions))
+            hits = main_version2.simulate(
+                grid, lasers, fixed + [main_version2.Block(b, position)
+                                       for b, position in placement])
+            if all(target in hits for target in targets):
+                solutions.add(placement)
+    return solutions
+
+
+SOLUTIONS = {name: brute_force(puzzle) for name, puzzle in PUZZLES.items()}
+
+
+def make_solver(name, options):
+    grid_data, lasers, targets, blocks = PUZZLES[name]
+    return main_version2.Solver(main_version2.Grid(grid_data, targets),
+                                dict(blocks), lasers, targets, **options)
+
+
+@pytest.mark.parametrize('option', sorted(OPTIONS))
+@pytest.mark.parametrize('name', sorted(PUZZLES))
+def test_solve_all_matches_brute_force(name, option):
+    solver = make_solver(name, OPTIONS[option])
+    found = [frozenset(solution) for solution in solver.solve_all()]
+    assert len(found) == len(set(found))
+    assert set(found) == SOLUTIONS[name]
+    # The grid has no block left once the generator is done
+    assert solver.grid.placement_key() == (0, 0, 0)
+
+
+@pytest.mark.parametrize('option', sorted(OPTIONS))
+@pytest.mark.parametrize('name', sorted(PUZZLES))
+def test_count_solutions_matches_brute_force(name, option):
+    solver = make_solver(name, OPTIONS[option])
+    assert solver.count_solutions() == len(SOLUTIONS[name])
+    assert solver.count_solutions(cap=1) == min(1, len(SOLUTIONS[name]))